@@ -7,22 +7,36 @@ from typing import List, Dict, Optional
 import logging
 import io
 import os
+from starlette.concurrency import run_in_threadpool
 # Add imports for OpenAI client and settings
 from openai import AsyncOpenAI
 from ...core.config import settings
+from ...core.admission import PRIORITY_BULK, PRIORITY_INTERACTIVE, agent_admission
+from ...core.idempotency import IdempotencyKey, idempotency_store
+from ...core.responses import FastJSONResponse
+from ...core.shared_state import call_store
+from ...schemas import (
+    Topic,
+    TopicResponse,
+    QuizQuestion,
+    QuizResponse,
+    ContentSub,
+    ContentMain,
+    ContentResponse,
+)
 
 # Import specific components from the new service locations
 from ...services.llm_service import (
     main_topic_outline_agent,
     open_quiz_agent,
-    content_writer_agent,
-    curated_topic_outline_agent,
     evaluate_quiz_understanding,
-    Runner,
-    ListOfTopics as LLMListOfTopics,
-    ListOfQuizQuestions as LLMListOfQuizQuestions,
-    ContentTopic as LLMContentTopic,
 )
+from ...services import pipeline
+from ...services.prompts import prompt_stats
+from ...services.dag import CheckpointStore, DagExecutor, StageFailed
+from ...services.study_plan_store import StudyPlanTooLarge, study_plan_store
+from ...services.question_bank import question_bank
+from ...services.subject_cache import cache_namespace, subject_cache
 
 # Set up logging
 logging.basicConfig(
@@ -37,8 +51,13 @@ client = AsyncOpenAI()
 # Create an APIRouter instead of a FastAPI app instance
 router = APIRouter()
 
+pipeline_checkpoints = CheckpointStore(
+    settings.PIPELINE_CHECKPOINT_DIR, max_age_seconds=settings.PIPELINE_CHECKPOINT_TTL_SECONDS
+)
+
 class TopicRequest(BaseModel):
     subject: str
+    material_set_id: Optional[str] = None # From /upload-files; scopes the subject cache to the uploaded material
 
 class QuizAnswer(BaseModel):
     question_index: int
@@ -47,38 +66,6 @@ class QuizAnswer(BaseModel):
 class QuizSubmission(BaseModel):
     answers: List[QuizAnswer]
 
-class Topic(BaseModel):
-    topic: str
-    description: str
-    subtopics: List[str]
-
-class TopicResponse(BaseModel):
-    list_of_topics: List[Topic]
-
-class QuizQuestion(BaseModel):
-    topic: str
-    quiz_question: str
-    choice_a: str
-    choice_b: str
-    choice_c: str
-    choice_d: str
-    correct_answer: str
-
-class QuizResponse(BaseModel):
-    list_quiz_questions: List[QuizQuestion]
-
-class ContentSub(BaseModel):
-    sub_topic_title: str
-    sub_content_text: str
-
-class ContentMain(BaseModel):
-    topic_title: str
-    main_description: str
-    subtopics: List[ContentSub]
-
-class ContentResponse(BaseModel):
-    topic: List[ContentMain]
-
 class UnderstandingScore(BaseModel):
     scores: Dict[str, float]
 
@@ -97,6 +84,16 @@ class SingleTopicGenerationRequest(BaseModel):
     topic: Topic # The specific topic to generate content for
     # Add other context if needed by the agent, e.g., main_subject: str
 
+class StudyPlanGenerationRequest(BaseModel):
+    subject: str
+    scores: Dict[str, float] # From /evaluate-quiz
+    title: Optional[str] = "Study Plan"
+
+class GeneratedStudyPlan(BaseModel):
+    plan_id: str # Fetch again with GET /study-plans/{plan_id}
+    title: str
+    topic: List[ContentMain]
+
 class DeleteFilesRequest(BaseModel):
     vector_store_file_ids: List[str]
 
@@ -106,70 +103,101 @@ class DeleteFilesResponse(BaseModel):
     message: str
 
 @router.post("/generate-topics", response_model=TopicResponse)
-async def generate_topics(request: TopicRequest):
+async def generate_topics(request: TopicRequest, idempotency_key: IdempotencyKey = None):
+    return FastJSONResponse(await idempotency_store.run(
+        idempotency_key, "generate-topics", request, lambda: _generate_topics(request)
+    ))
+
+async def _generate_topics(request: TopicRequest):
     try:
         logger.info(f"Generating topics for subject: {request.subject}")
-        input_prompt = request.subject
 
-        main_topic_result = await Runner.run(
-            main_topic_outline_agent,
-            input_prompt,
-        )
-        
-        response_topics = [
-            Topic(topic=t.topic, description=t.description, subtopics=t.subtopics)
-            for t in main_topic_result.final_output.list_of_topics
-        ]
-
-        logger.info(f"Generated {len(response_topics)} topics")
-        return TopicResponse(list_of_topics=response_topics)
+        # Topics depend on the uploaded files, so only reuse them within the same material set
+        use_cache = settings.SUBJECT_CACHE_ENABLED and bool(request.material_set_id)
+        cache_ns = cache_namespace(main_topic_outline_agent.name, request.material_set_id)
+        if use_cache:
+            hit = await call_store(subject_cache.lookup, cache_ns, request.subject)
+            if hit is not None:
+                logger.info(f"Reusing topics generated for '{hit.matched_subject}' (similarity {hit.similarity:.2f})")
+                return hit.value
+
+        async with agent_admission.slot(PRIORITY_INTERACTIVE):
+            # Agent output is already a validated TopicResponse
+            response_topics: TopicResponse = await pipeline.generate_topics(request.subject)
+
+        if use_cache:
+            await call_store(subject_cache.add, cache_ns, request.subject, response_topics)
+
+        logger.info(f"Generated {len(response_topics.list_of_topics)} topics")
+        return response_topics
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating topics: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating topics: {str(e)}")
 
 @router.post("/generate-quiz", response_model=QuizResponse)
-async def generate_quiz(topics: TopicResponse):
+async def generate_quiz(topics: TopicResponse, material_set_id: Optional[str] = None, idempotency_key: IdempotencyKey = None):
+    return FastJSONResponse(await idempotency_store.run(
+        idempotency_key,
+        "generate-quiz",
+        {"topics": topics, "material_set_id": material_set_id},
+        lambda: _generate_quiz(topics, material_set_id),
+    ))
+
+async def _generate_quiz(topics: TopicResponse, material_set_id: Optional[str] = None):
     try:
         logger.info(f"Generating quiz for {len(topics.list_of_topics)} topics")
-        topics_string = "\n".join(
-            f"{i+1}. {topic.topic}\n   Description: {topic.description}\n   Subtopics: {', '.join(topic.subtopics)}"
-            for i, topic in enumerate(topics.list_of_topics)
-        )
-        
-        quiz_result = await Runner.run(
-            open_quiz_agent,
-            f"Here are the topics:\n{topics_string}"
+
+        if settings.QUESTION_BANK_ENABLED:
+            # The bank already reuses questions per topic and rotates them between quizzes.
+            # The quiz is admitted once; the per-topic calls share that slot
+            async with agent_admission.slot(PRIORITY_INTERACTIVE, fan_out=True):
+                response_quiz: QuizResponse = await pipeline.assemble_quiz(topics, agent_admission.call, material_set_id)
+            logger.info(f"Generated {len(response_quiz.list_quiz_questions)} quiz questions")
+            return response_quiz
+
+        # The quiz agent only sees the topic list, so near-identical topic lists of the same material can share a quiz
+        topics_subject = " ".join(
+            f"{topic.topic} {' '.join(topic.subtopics)}" for topic in topics.list_of_topics
         )
-        response_questions = [
-            QuizQuestion(
-                topic=q.topic,
-                quiz_question=q.quiz_question,
-                choice_a=q.choice_a,
-                choice_b=q.choice_b,
-                choice_c=q.choice_c,
-                choice_d=q.choice_d,
-                correct_answer=q.correct_answer
-            ) for q in quiz_result.final_output.list_quiz_questions
-        ]
-
-        logger.info(f"Generated {len(response_questions)} quiz questions")
-        return QuizResponse(list_quiz_questions=response_questions)
+        cache_ns = cache_namespace(open_quiz_agent.name, material_set_id)
+        if settings.SUBJECT_CACHE_ENABLED:
+            hit = await call_store(subject_cache.lookup, cache_ns, topics_subject)
+            if hit is not None:
+                logger.info(f"Reusing quiz generated for a similar topic list (similarity {hit.similarity:.2f})")
+                return hit.value
+
+        async with agent_admission.slot(PRIORITY_INTERACTIVE):
+            response_quiz = await pipeline.generate_quiz(topics)
+        if settings.SUBJECT_CACHE_ENABLED:
+            await call_store(subject_cache.add, cache_ns, topics_subject, response_quiz)
+
+        logger.info(f"Generated {len(response_quiz.list_quiz_questions)} quiz questions")
+        return response_quiz
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating quiz: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
 
 @router.post("/evaluate-quiz", response_model=UnderstandingScore)
-async def evaluate_quiz(quiz: QuizResponse, submission: QuizSubmission):
+async def evaluate_quiz(quiz: QuizResponse, submission: QuizSubmission, idempotency_key: IdempotencyKey = None):
+    return FastJSONResponse(await idempotency_store.run(
+        idempotency_key,
+        "evaluate-quiz",
+        {"quiz": quiz, "submission": submission},
+        lambda: _evaluate_quiz(quiz, submission),
+    ))
+
+async def _evaluate_quiz(quiz: QuizResponse, submission: QuizSubmission):
     try:
         logger.info(f"Evaluating quiz with {len(submission.answers)} answers")
         user_answers = [{"question_index": ans.question_index, "answer": ans.answer}
                        for ans in submission.answers]
-        
-        llm_quiz_structure = LLMListOfQuizQuestions(list_quiz_questions=[
-            q for q in quiz.list_quiz_questions
-        ])
 
-        understanding_scores = evaluate_quiz_understanding(llm_quiz_structure, user_answers)
+        # The request body is the agent's quiz model, no conversion needed
+        understanding_scores = evaluate_quiz_understanding(quiz, user_answers)
         logger.info(f"Evaluated understanding for {len(understanding_scores)} topics")
         return UnderstandingScore(scores=understanding_scores)
     except Exception as e:
@@ -177,26 +205,24 @@ async def evaluate_quiz(quiz: QuizResponse, submission: QuizSubmission):
         raise HTTPException(status_code=500, detail=f"Error evaluating quiz: {str(e)}")
 
 @router.post("/curate-topics", response_model=TopicResponse)
-async def curate_topics(request: TopicRequest, understanding: UnderstandingScore):
+async def curate_topics(request: TopicRequest, understanding: UnderstandingScore, idempotency_key: IdempotencyKey = None):
+    return FastJSONResponse(await idempotency_store.run(
+        idempotency_key,
+        "curate-topics",
+        {"request": request, "understanding": understanding},
+        lambda: _curate_topics(request, understanding),
+    ))
+
+async def _curate_topics(request: TopicRequest, understanding: UnderstandingScore):
     try:
         logger.info(f"Curating topics for subject: {request.subject}")
-        understanding_string = "\n".join(
-            f"{topic}: {score:.1f}%"
-            for topic, score in understanding.scores.items()
-        )
-        
-        curated_result = await Runner.run(
-            curated_topic_outline_agent,
-            f"Here is the main topic:\n{request.subject}\nHere is the understanding of the topic:\n{understanding_string}"
-        )
-        
-        response_topics = [
-            Topic(topic=t.topic, description=t.description, subtopics=t.subtopics)
-            for t in curated_result.final_output.list_of_topics
-        ]
-
-        logger.info(f"Curated {len(response_topics)} topics")
-        return TopicResponse(list_of_topics=response_topics)
+        async with agent_admission.slot(PRIORITY_INTERACTIVE):
+            response_topics: TopicResponse = await pipeline.curate_topics(request.subject, understanding.scores)
+
+        logger.info(f"Curated {len(response_topics.list_of_topics)} topics")
+        return response_topics
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error curating topics: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error curating topics: {str(e)}")
@@ -264,47 +290,81 @@ async def curate_topics(request: TopicRequest, understanding: UnderstandingScore
 
 # --- New Endpoint for Single Topic Generation ---
 @router.post("/generate-single-topic", response_model=ContentMain)
-async def generate_single_topic(request: SingleTopicGenerationRequest):
+async def generate_single_topic(request: SingleTopicGenerationRequest, idempotency_key: IdempotencyKey = None):
     """Generates content for a single topic."""
+    return FastJSONResponse(await idempotency_store.run(
+        idempotency_key, "generate-single-topic", request, lambda: _generate_single_topic(request)
+    ))
+
+async def _generate_single_topic(request: SingleTopicGenerationRequest):
     logger.info(f"Generating content for single topic: {request.topic.topic}")
     try:
-        # Construct prompt specific to this single topic
-        # Example: You might need more context than just the topic title/desc/subtopics
-        # Adjust the prompt as needed for your content_writer_agent
-        topic_string = f"Topic: {request.topic.topic}\nDescription: {request.topic.description}\nSubtopics: {', '.join(request.topic.subtopics)}"
-        prompt = f"Write content for the following topic:\n{topic_string}\nYou need to output the main content, its description and the subtopics with the content for each subtopic."
-
         # Run the agent for the single topic
-        content_result = await Runner.run(content_writer_agent, prompt)
-
-        # Expecting the agent to return a list containing ONE ContentMain object for the single topic
-        if not content_result.final_output.topic or len(content_result.final_output.topic) != 1:
-            logger.error(f"Agent did not return exactly one ContentMain object for topic: {request.topic.topic}")
-            raise HTTPException(status_code=500, detail="Content generation for topic failed internally.")
-
-        single_topic_content = content_result.final_output.topic[0]
-
-        # Map to response model (assuming agent output matches ContentMain structure)
-        response_main = ContentMain(
-            topic_title=single_topic_content.topic_title,
-            main_description=single_topic_content.main_description,
-            subtopics=[
-                ContentSub(sub_topic_title=sub.sub_topic_title, sub_content_text=sub.sub_content_text)
-                for sub in single_topic_content.subtopics
-            ]
-        )
+        async with agent_admission.slot(PRIORITY_BULK):
+            # Agent output is already a validated ContentMain
+            response_main: ContentMain = await pipeline.write_topic_content(request.topic)
 
         logger.info(f"Successfully generated content for topic: {request.topic.topic}")
         return response_main
 
+    except HTTPException:
+        raise
+    except pipeline.PipelineError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=500, detail="Content generation for topic failed internally.")
     except Exception as e:
         logger.error(f"Error generating content for topic {request.topic.topic}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating content for topic: {str(e)}")
 
+# --- Whole study plan as one checkpointed DAG ---
+@router.post("/generate-study-plan", response_model=GeneratedStudyPlan)
+async def generate_study_plan(request: StudyPlanGenerationRequest, idempotency_key: IdempotencyKey = None):
+    """Curates the topics and writes content for all of them in parallel, then stores the plan."""
+    return FastJSONResponse(await idempotency_store.run(
+        idempotency_key, "generate-study-plan", request, lambda: _generate_study_plan(request)
+    ))
+
+async def _generate_study_plan(request: StudyPlanGenerationRequest):
+    logger.info(f"Generating study plan for subject: {request.subject}")
+    try:
+        # A retry after a failed topic only re-runs the stages that didn't finish.
+        # The plan is admitted once; its curation and content nodes share that slot
+        executor = DagExecutor(pipeline.curated_content_stages(agent_admission.call), pipeline_checkpoints)
+        async with agent_admission.slot(PRIORITY_BULK, fan_out=True):
+            run = await executor.run({"subject": request.subject, "scores": request.scores})
+        content: List[ContentMain] = run.values["content"]
+
+        manifest = await run_in_threadpool(
+            study_plan_store.save, request.title, [topic.model_dump() for topic in content]
+        )
+        # Checkpoints only serve retries of a failed run; the finished plan is in the store now
+        await run_in_threadpool(pipeline_checkpoints.discard, run)
+        logger.info(f"Generated study plan {manifest.plan_id} with {len(content)} topics ({run.skipped} nodes from checkpoints)")
+        return GeneratedStudyPlan(plan_id=manifest.plan_id, title=manifest.title, topic=content)
+    except StageFailed as e:
+        if isinstance(e.cause, HTTPException):
+            raise e.cause
+        logger.error(f"Error generating study plan: {str(e)}", exc_info=True)
+        if isinstance(e.cause, pipeline.PipelineError):
+            raise HTTPException(status_code=500, detail="Content generation for topic failed internally.")
+        raise HTTPException(status_code=500, detail=f"Error generating study plan: {str(e)}")
+    except StudyPlanTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating study plan: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error generating study plan: {str(e)}")
+
 # --- New Endpoint for File Deletion ---
 @router.post("/delete-vector-files", response_model=DeleteFilesResponse)
-async def delete_vector_files(request: DeleteFilesRequest):
+async def delete_vector_files(request: DeleteFilesRequest, idempotency_key: IdempotencyKey = None):
     """Deletes specified files from the OpenAI Vector Store."""
+    return FastJSONResponse(await idempotency_store.run(
+        idempotency_key, "delete-vector-files", request, lambda: _delete_vector_files(request)
+    ))
+
+async def _delete_vector_files(request: DeleteFilesRequest):
     vector_store_id = settings.OPENAI_VECTOR_STORE_ID
     if not vector_store_id:
         logger.error("OPENAI_VECTOR_STORE_ID not configured. Cannot delete files.")
@@ -337,6 +397,22 @@ async def delete_vector_files(request: DeleteFilesRequest):
     logger.info(message)
     return DeleteFilesResponse(deleted_count=len(success_delete), failed_count=len(failed_delete), message=message)
 
+@router.get("/subject-cache/stats")
+async def subject_cache_stats():
+    """Hit rate and recent per-hit similarity scores, for tuning SUBJECT_CACHE_SIMILARITY_THRESHOLD."""
+    return await call_store(subject_cache.stats)
+
+@router.get("/question-bank/stats")
+async def question_bank_stats():
+    """Banked topics and questions, and how many quiz questions were served from the bank."""
+    return await call_store(question_bank.stats)
+
+@router.get("/prompt-stats")
+async def get_prompt_stats():
+    """Input tokens per agent call, the stable prefix length and tokens saved by prompt compaction."""
+    return prompt_stats.stats()
+
 @router.get("/health")
 async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    # Never queued behind agent runs
+    return {"status": "healthy", "agent_runs": agent_admission.stats()} 
\ No newline at end of file
@@ -0,0 +1,78 @@
+# agent_backend/app/api/endpoints/pdf_export.py
+
+import logging
+from typing import Annotated, Iterable, Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+from ...schemas import ContentResponse
+from ...services.pdf_export import Block, content_blocks, markdown_blocks, pdf_cache, pdf_cache_key, render_pdf
+from ...services.study_plan_store import plan_content_hash
+from .generation import MarkdownContent
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+class ContentPdfRequest(BaseModel):
+    content: ContentResponse
+    title: Optional[str] = "Study Plan"
+
+
+def pdf_response(key: str, title: str, blocks: Iterable[Block], headers: Optional[dict] = None) -> Response:
+    """Serves a cached PDF as a file, or renders it as a chunked stream while caching it."""
+    headers = {"Content-Disposition": 'attachment; filename="study-plan.pdf"', **(headers or {})}
+    cached = pdf_cache.get(key)
+    if cached is not None:
+        logger.info(f"Serving cached PDF {key[:12]}")
+        return FileResponse(cached, media_type="application/pdf", headers=headers)
+    # Sync iterators are run in the threadpool, so rendering never blocks the event loop
+    return StreamingResponse(
+        pdf_cache.store_while_streaming(key, render_pdf(title, blocks)),
+        media_type="application/pdf",
+        headers=headers,
+    )
+
+
+@router.post("/generate-pdf-from-content")
+def generate_pdf_from_content(request: ContentPdfRequest):
+    """Renders a generated study plan (ContentResponse) as a PDF."""
+    title = request.title or "Study Plan"
+    # Same key as GET /study-plans/{plan_id}/pdf for the same plan
+    plan_id = plan_content_hash(title, [topic.model_dump() for topic in request.content.topic])
+    logger.info(f"PDF requested for plan content {plan_id} ({len(request.content.topic)} topics)")
+    return pdf_response(
+        pdf_cache_key("plan", title, plan_id.encode("ascii")),
+        title,
+        content_blocks(title, request.content.topic),
+    )
+
+
+@router.post("/generate-pdf-from-text")
+def generate_pdf_from_text(request: MarkdownContent):
+    """Renders markdown text as a PDF."""
+    title = request.title or "Study Plan"
+    return pdf_response(
+        pdf_cache_key("markdown", title, request.content.encode("utf-8")),
+        title,
+        markdown_blocks(request.content.splitlines()),
+    )
+
+
+@router.post("/generate-pdf-from-file")
+def generate_pdf_from_file(
+    markdown_file: Annotated[UploadFile, File()],
+    title: Annotated[str, Form()] = "Study Plan",
+):
+    """Renders an uploaded markdown file as a PDF."""
+    try:
+        text = markdown_file.file.read().decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Markdown file must be UTF-8 text.")
+    return pdf_response(
+        pdf_cache_key("markdown", title, text.encode("utf-8")),
+        title,
+        markdown_blocks(text.splitlines()),
+    )
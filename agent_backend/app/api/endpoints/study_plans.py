@@ -0,0 +1,115 @@
+# agent_backend/app/api/endpoints/study_plans.py
+
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from pydantic import BaseModel
+
+from ...schemas import ContentMain
+from ...services.pdf_export import content_blocks, pdf_cache_key
+from ...services.study_plan_store import StudyPlanManifest, StudyPlanTooLarge, study_plan_store
+from .pdf_export import pdf_response
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Plans are content addressed, so a given URL never changes
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+class SaveStudyPlanRequest(BaseModel):
+    title: Optional[str] = "Study Plan"
+    topic: List[ContentMain]
+
+class StudyPlanSummary(BaseModel):
+    plan_id: str
+    title: str
+    etag: str
+    topic_titles: List[str]
+
+class StudyPlanResponse(BaseModel):
+    plan_id: str
+    title: str
+    topic: List[ContentMain]
+
+
+def _etag(manifest: StudyPlanManifest, topic_index: Optional[int] = None) -> str:
+    if topic_index is None:
+        return f'"{manifest.plan_id}"'
+    return f'"{manifest.plan_id}-{topic_index}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def _get_manifest_or_404(plan_id: str) -> StudyPlanManifest:
+    try:
+        manifest = study_plan_store.get_manifest(plan_id)
+    except ValueError:
+        manifest = None
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Study plan not found.")
+    return manifest
+
+
+@router.post("/study-plans", response_model=StudyPlanSummary)
+def save_study_plan(request: SaveStudyPlanRequest):
+    """Stores a generated study plan and returns its content-addressed id."""
+    try:
+        manifest = study_plan_store.save(
+            request.title or "Study Plan",
+            [topic.model_dump() for topic in request.topic],
+        )
+    except StudyPlanTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return StudyPlanSummary(
+        plan_id=manifest.plan_id,
+        title=manifest.title,
+        etag=_etag(manifest),
+        topic_titles=manifest.topic_titles,
+    )
+
+@router.get("/study-plans/{plan_id}", response_model=StudyPlanResponse)
+def get_study_plan(plan_id: str, if_none_match: Optional[str] = Header(default=None)):
+    """Returns a stored study plan, or 304 if the client already has it."""
+    manifest = _get_manifest_or_404(plan_id)
+    etag = _etag(manifest)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=study_plan_store.read_plan(manifest), media_type="application/json", headers=headers)
+
+@router.get("/study-plans/{plan_id}/topics/{topic_index}", response_model=ContentMain)
+def get_study_plan_topic(plan_id: str, topic_index: int, if_none_match: Optional[str] = Header(default=None)):
+    """Returns a single topic of a stored study plan, or 304 if the client already has it."""
+    manifest = _get_manifest_or_404(plan_id)
+    if topic_index < 0 or topic_index >= manifest.topic_count:
+        raise HTTPException(status_code=404, detail="Topic not found in study plan.")
+    etag = _etag(manifest, topic_index)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=study_plan_store.read_topic(manifest, topic_index),
+        media_type="application/json",
+        headers=headers,
+    )
+
+@router.get("/study-plans/{plan_id}/pdf")
+def get_study_plan_pdf(plan_id: str, if_none_match: Optional[str] = Header(default=None)):
+    """Returns a stored study plan as a PDF, rendered one topic at a time on first download."""
+    manifest = _get_manifest_or_404(plan_id)
+    key = pdf_cache_key("plan", manifest.title, manifest.plan_id.encode("ascii"))
+    # The PDF changes when the renderer does, so revalidate instead of marking it immutable
+    headers = {"ETag": f'"{key[:32]}"', "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    topics = (
+        ContentMain.model_validate_json(study_plan_store.read_topic(manifest, index))
+        for index in range(manifest.topic_count)
+    )
+    return pdf_response(key, manifest.title, content_blocks(manifest.title, topics), headers=headers)
@@ -1,12 +1,14 @@
 # agent_backend/app/api/endpoints/upload.py
 
+import hashlib
 import logging
-from typing import List, Annotated
+from typing import List, Annotated, Tuple
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from openai import AsyncOpenAI # Use AsyncOpenAI for async FastAPI
 
 from ...core.config import settings
+from ...core.idempotency import IdempotencyKey, idempotency_store
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -19,13 +21,49 @@ client = AsyncOpenAI()
 async def upload_files_to_vector_store(
     user_id: Annotated[str, Form()],
     course_notes: Annotated[List[UploadFile], File()], 
-    past_exams: Annotated[List[UploadFile] | None, File()] = None
+    past_exams: Annotated[List[UploadFile] | None, File()] = None,
+    idempotency_key: IdempotencyKey = None,
 ):
     """
     Receives user ID, course notes (batch), and optional past exams (batch),
     uploads them to the configured OpenAI Vector Store.
     Associates files with the provided user_id in metadata (limited support).
     """
+    # Read everything while the request is alive: the idempotent handler keeps running
+    # after a client disconnect, when FastAPI has already closed the UploadFiles
+    notes = [await _read_upload(note) for note in course_notes or []]
+    exams = [await _read_upload(exam) for exam in past_exams or []]
+
+    payload = None
+    if idempotency_key:
+        # Reusing a key with different file contents must not replay the first upload's response
+        payload = {
+            "user_id": user_id,
+            "course_notes": [_file_fingerprint(note) for note in notes],
+            "past_exams": [_file_fingerprint(exam) for exam in exams],
+        }
+    return await idempotency_store.run(
+        idempotency_key,
+        "upload-files",
+        payload,
+        lambda: _upload_files_to_vector_store(user_id, notes, exams),
+    )
+
+async def _read_upload(file: UploadFile) -> Tuple[str, bytes]:
+    try:
+        return file.filename, await file.read()
+    finally:
+        await file.close()
+
+def _file_fingerprint(upload: Tuple[str, bytes]) -> dict:
+    filename, content = upload
+    return {"filename": filename, "sha256": hashlib.sha256(content).hexdigest()}
+
+async def _upload_files_to_vector_store(
+    user_id: str,
+    course_notes: List[Tuple[str, bytes]],
+    past_exams: List[Tuple[str, bytes]] | None,
+):
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID is required.")
     if not settings.OPENAI_VECTOR_STORE_ID:
@@ -51,20 +89,19 @@ async def upload_files_to_vector_store(
     # The recommended pattern is per-user vector stores.
     # For now, we proceed with upload to the shared store.
 
-    for file, file_type in files_to_upload:
+    for (filename, file_content), file_type in files_to_upload:
         openai_file_obj = None # Keep track of the uploaded file object ID
         try:
-            # Read file content into memory - consider streaming for large files
-            file_content = await file.read()
+            content_hash = hashlib.sha256(file_content).hexdigest()
             
             # Step 1: Upload the file generally to OpenAI
             # Pass filename for clarity in OpenAI UI if needed
             # Purpose must be 'assistants' for use with Assistants API
             openai_file_obj = await client.files.create(
-                file=(file.filename, file_content), 
+                file=(filename, file_content), 
                 purpose='assistants'
             )
-            logger.info(f"Successfully uploaded {file.filename} to OpenAI Files, ID: {openai_file_obj.id}")
+            logger.info(f"Successfully uploaded {filename} to OpenAI Files, ID: {openai_file_obj.id}")
 
             # Step 2: Add the uploaded file to the specific Vector Store and poll
             # Use the create_and_poll helper for vector store files
@@ -79,17 +116,18 @@ async def upload_files_to_vector_store(
             # Check status after polling (should be completed if no exception)
             if vs_file.status == 'completed':
                 uploaded_file_details.append({
-                    "filename": file.filename,
+                    "filename": filename,
                     "openai_file_id": openai_file_obj.id, # Original file ID
                     "vector_store_file_id": vs_file.id, # ID specific to the file in this VS
                     "status": vs_file.status,
-                    "type": file_type
+                    "type": file_type,
+                    "content_sha256": content_hash,
                 })
             else:
                  # Should not happen if poll was successful, but handle defensively
                  logger.warning(f"File {openai_file_obj.id} added to VS {vector_store_id} but status is {vs_file.status}")
                  uploaded_file_details.append({
-                     "filename": file.filename,
+                     "filename": filename,
                      "openai_file_id": openai_file_obj.id,
                      "vector_store_file_id": vs_file.id,
                      "status": f"pending ({vs_file.status})", # Indicate non-completion
@@ -97,17 +135,15 @@ async def upload_files_to_vector_store(
                  })
 
         except Exception as e:
-            logger.error(f"Failed processing {file.filename} for user {user_id}: {str(e)}", exc_info=True)
+            logger.error(f"Failed processing {filename} for user {user_id}: {str(e)}", exc_info=True)
             # Store failure information
             uploaded_file_details.append({
-                "filename": file.filename,
+                "filename": filename,
                 "openai_file_id": openai_file_obj.id if openai_file_obj else None,
                 "status": "failed",
                 "error": str(e),
                 "type": file_type
             })
-        finally:
-             await file.close() # Ensure file handle is closed
 
     successful_uploads = [f for f in uploaded_file_details if f["status"] == "completed"]
     failed_uploads = [f for f in uploaded_file_details if f["status"] == "failed"]
@@ -115,9 +151,15 @@ async def upload_files_to_vector_store(
     if not successful_uploads:
          raise HTTPException(status_code=500, detail="Failed to upload any files.", headers={"X-Upload-Errors": str(failed_uploads)}) 
 
+    # Identifies the uploaded material by content, so identical uploads share cached agent output
+    material_set_id = hashlib.sha256(
+        "".join(sorted(f["content_sha256"] for f in successful_uploads)).encode("utf-8")
+    ).hexdigest()[:32]
+
     return {
         "message": f"Processed {len(files_to_upload)} files. {len(successful_uploads)} successful, {len(failed_uploads)} failed.",
         "vector_store_id": vector_store_id,
         "user_id": user_id,
+        "material_set_id": material_set_id,
         "upload_details": uploaded_file_details
     } 
\ No newline at end of file
@@ -0,0 +1,174 @@
+# agent_backend/app/core/admission.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from .config import settings
+from .rate_limit import SharedTokenBucket, TokenBucket
+from .shared_state import shared_state
+
+logger = logging.getLogger(__name__)
+
+# Lower value is admitted first
+PRIORITY_INTERACTIVE = 0 # Short agent calls a user is actively waiting on (topics, quiz, curation)
+PRIORITY_BULK = 1 # Long content-writing runs
+
+
+class AdmissionController:
+    """
+    Bounds the number of concurrent agent runs and the number of runs waiting for a slot.
+
+    Runs beyond `max_concurrent` wait in a priority queue of at most `max_queue` entries.
+    When the queue is full (or a run waits longer than `queue_timeout`) the request fails
+    fast with 503 and a Retry-After estimated from how quickly the queue is draining.
+    With a `rate_limiter`, admitted runs also wait for a token before they start.
+    A request that fans out into several agent calls is admitted once with `fan_out=True`
+    and makes its calls through `call`, so it never queues behind its own calls.
+    Cheap endpoints (/evaluate-quiz, /health, stored plans) never go through the controller.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, rate_window: float = 60.0, rate_limiter=None):
+        self.max_concurrent = max_concurrent
+        self.rate_limiter = rate_limiter
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate_window = rate_window
+        self.active = 0
+        self.queued = 0
+        self._waiters: list = [] # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._completions: deque = deque() # monotonic timestamps of finished runs
+        self._avg_run_seconds = 30.0 # EWMA, used until enough runs have completed
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, fan_out: bool = False):
+        await self._acquire(priority)
+        started = time.monotonic()
+        try:
+            if self.rate_limiter is not None and not fan_out:
+                await self.rate_limiter.acquire()
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    async def call(self, fn, *args):
+        """One agent call of a request admitted with `fan_out=True`; only waits for a rate token."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        return await fn(*args)
+
+    async def _acquire(self, priority: int):
+        if self.active < self.max_concurrent and self.queued == 0:
+            self.active += 1
+            return
+
+        if self.queued >= self.max_queue:
+            retry_after = self.retry_after()
+            logger.warning(f"Agent queue full ({self.active} running, {self.queued} queued), rejecting with Retry-After {retry_after}s")
+            raise self._overloaded(retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # wait_for can time out after the slot was already handed over; pass it on
+                self._release(None)
+            else:
+                self.queued -= 1
+            retry_after = self.retry_after()
+            logger.warning(f"Agent run waited over {self.queue_timeout}s for a slot, rejecting with Retry-After {retry_after}s")
+            raise self._overloaded(retry_after)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the client went away; pass it on
+                self._release(None)
+            else:
+                self.queued -= 1
+            raise
+
+    def _release(self, run_seconds):
+        self.active -= 1
+        if run_seconds is not None:
+            self._completions.append(time.monotonic())
+            self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * run_seconds
+
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.cancelled():
+                continue
+            self.queued -= 1
+            self.active += 1
+            future.set_result(None)
+            break
+
+    def drain_rate(self) -> float:
+        """Completed runs per second over the recent window."""
+        cutoff = time.monotonic() - self.rate_window
+        while self._completions and self._completions[0] < cutoff:
+            self._completions.popleft()
+        if len(self._completions) < 2:
+            return 0.0
+        span = max(time.monotonic() - self._completions[0], 1.0)
+        return len(self._completions) / span
+
+    def retry_after(self) -> int:
+        """Seconds until a new run would likely be admitted."""
+        ahead = self.queued + 1
+        rate = self.drain_rate()
+        if rate > 0:
+            estimate = ahead / rate
+        else:
+            estimate = math.ceil(ahead / self.max_concurrent) * self._avg_run_seconds
+        return max(1, min(600, math.ceil(estimate)))
+
+    def _overloaded(self, retry_after: int) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="The server is busy generating other study plans. Please retry shortly.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "drain_rate_per_minute": round(self.drain_rate() * 60, 2),
+        }
+
+
+def _worker_share(limit: int) -> int:
+    # Workers get requests round-robin, so equal shares keep the deployment-wide limit.
+    # A request never needs more than one slot (fan-outs share theirs), so one is enough
+    return max(1, limit // max(1, settings.WEB_CONCURRENCY))
+
+
+def _build_rate_limiter():
+    rate = settings.AGENT_MAX_RUNS_PER_MINUTE
+    if not rate:
+        return None
+    if shared_state is not None:
+        return SharedTokenBucket(shared_state, "agent_runs", rate, burst=settings.AGENT_MAX_CONCURRENT_RUNS)
+    return TokenBucket(rate / max(1, settings.WEB_CONCURRENCY), burst=_worker_share(settings.AGENT_MAX_CONCURRENT_RUNS))
+
+
+# Each worker sees only its own queue, so Retry-After is estimated from this worker's
+# share of the queue and of the drain rate, which have the same ratio as the totals
+agent_admission = AdmissionController(
+    max_concurrent=_worker_share(settings.AGENT_MAX_CONCURRENT_RUNS),
+    max_queue=_worker_share(settings.AGENT_MAX_QUEUED_RUNS),
+    queue_timeout=settings.AGENT_QUEUE_TIMEOUT_SECONDS,
+    rate_limiter=_build_rate_limiter(),
+)
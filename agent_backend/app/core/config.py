@@ -1,9 +1,68 @@
+from typing import Dict, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: str
     OPENAI_VECTOR_STORE_ID: str
 
+    # SQLite file (WAL mode) for state shared by all worker processes: idempotency records,
+    # the subject cache, the question bank and rate limits. Unset keeps that state in memory.
+    SHARED_STATE_PATH: Optional[str] = None
+
+    # Idempotency-Key handling for POST endpoints
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_MAX_ENTRIES: int = 1024
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: float = 600.0
+    IDEMPOTENCY_SQLITE_PATH: Optional[str] = None # Falls back to SHARED_STATE_PATH, then to the in-memory store
+
+    # Server-side study plan store
+    STUDY_PLAN_STORE_DIR: str = "data/study_plans"
+    STUDY_PLAN_COMPRESSION: str = "auto" # "auto" (zstd when installed, else gzip), "zstd" or "gzip"
+    STUDY_PLAN_MAX_BYTES: int = 2 * 1024 * 1024 # Uncompressed JSON per plan
+    STUDY_PLAN_STORE_MAX_BYTES: int = 1024 * 1024 * 1024 # On disk; the oldest plans are deleted beyond this
+
+    # Responses at least this large are compressed (brotli when installed, else gzip) if the client accepts it
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024
+
+    # Admission control for agent runs. Limits are for the whole deployment: each of the
+    # WEB_CONCURRENCY worker processes (set by gunicorn.conf.py) enforces an equal share
+    WEB_CONCURRENCY: int = 1
+    AGENT_MAX_CONCURRENT_RUNS: int = 4
+    AGENT_MAX_QUEUED_RUNS: int = 32
+    AGENT_QUEUE_TIMEOUT_SECONDS: float = 120.0
+    AGENT_MAX_RUNS_PER_MINUTE: Optional[float] = None # Across all workers when SHARED_STATE_PATH is set
+
+    # Near-duplicate subject cache in front of the topic and quiz agents
+    SUBJECT_CACHE_ENABLED: bool = True
+    SUBJECT_CACHE_SIMILARITY_THRESHOLD: float = 0.7
+    SUBJECT_CACHE_MAX_ENTRIES: int = 2048
+
+    # Checkpoints of finished pipeline DAG stages, keyed by stage input hash
+    PIPELINE_CHECKPOINT_DIR: str = "data/checkpoints"
+    PIPELINE_CHECKPOINT_TTL_SECONDS: int = 24 * 60 * 60 # Checkpoints of runs that were not retried
+
+    # Rendered study plan PDFs, keyed by content hash
+    PDF_CACHE_DIR: str = "data/pdf_cache"
+    PDF_CACHE_MAX_BYTES: int = 512 * 1024 * 1024 # On disk; the least recently served PDFs are deleted beyond this
+
+    # Per-topic quiz question bank; quizzes only call the agent for topics with too few banked questions
+    QUESTION_BANK_ENABLED: bool = True
+    QUIZ_QUESTION_COUNT: int = 10
+    QUESTION_BANK_GENERATE_PER_TOPIC: int = 4 # At least this many questions per agent call, to fill the bank
+    QUESTION_BANK_MAX_PER_TOPIC: int = 20
+    QUESTION_BANK_MAX_TOPICS: int = 4096
+
+    # Token budget for the prompt (excluding agent instructions) of each agent call; "default" for other agents
+    PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+        "main_topic_outline_agent": 200,
+        "open_quiz_agent": 1200,
+        "topic_quiz_agent": 400,
+        "curated_topic_outline_agent": 1000,
+        "content_writer_agent": 400,
+        "default": 2000,
+    }
+
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', extra='ignore')
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
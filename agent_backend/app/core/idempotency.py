@@ -0,0 +1,363 @@
+# agent_backend/app/core/idempotency.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Annotated, Any, Awaitable, Callable, Optional
+
+from fastapi import Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from .config import settings
+from .shared_state import SharedState, call_store, shared_state
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# Header dependency shared by every POST endpoint, e.g.
+# `idempotency_key: IdempotencyKey = None`
+IdempotencyKey = Annotated[Optional[str], Header(alias="Idempotency-Key")]
+
+
+class IdempotencyRecord(BaseModel):
+    key: str
+    fingerprint: str
+    status: str
+    response: Any = None
+    created_at: float
+    owner: Optional[int] = None # pid of the worker running an in-progress request
+    claimed_at: Optional[float] = None # last heartbeat of that worker
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of a request payload, used to detect a key being reused for a different request."""
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _lease_expired(record: IdempotencyRecord, lease_seconds: float, fingerprint: str) -> bool:
+    # Only the same request may take over, a different one still gets the 422
+    return (
+        record.status == IN_PROGRESS
+        and record.fingerprint == fingerprint
+        and (record.claimed_at or record.created_at) < time.time() - lease_seconds
+    )
+
+
+class MemoryIdempotencyBackend:
+    """Bounded, TTL-evicting in-process store (LRU order on insertion/completion)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, lease_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self._records: "OrderedDict[str, IdempotencyRecord]" = OrderedDict()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        for key in [k for k, r in self._records.items() if r.created_at < cutoff]:
+            del self._records[key]
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    def claim(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        """
+        Marks `key` as in progress. Returns the existing record instead if the key is already
+        known, unless it is an in-progress claim whose lease ran out; that claim is taken over.
+        """
+        self._evict()
+        existing = self._records.get(key)
+        if existing is not None and not _lease_expired(existing, self.lease_seconds, fingerprint):
+            return existing
+        now = time.time()
+        self._records[key] = IdempotencyRecord(
+            key=key, fingerprint=fingerprint, status=IN_PROGRESS, created_at=now, owner=os.getpid(), claimed_at=now
+        )
+        self._evict()
+        return None
+
+    def renew(self, key: str):
+        record = self._records.get(key)
+        if record is not None and record.status == IN_PROGRESS:
+            record.claimed_at = time.time()
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        self._evict()
+        return self._records.get(key)
+
+    def complete(self, key: str, fingerprint: str, response: Any):
+        self._records.pop(key, None)
+        self._records[key] = IdempotencyRecord(
+            key=key, fingerprint=fingerprint, status=COMPLETED, response=response, created_at=time.time()
+        )
+        self._evict()
+
+    def release(self, key: str):
+        self._records.pop(key, None)
+
+
+class SQLiteIdempotencyBackend:
+    """
+    Same contract as MemoryIdempotencyBackend, persisted in SQLite so records survive
+    restarts and are shared by all worker processes. A worker that dies mid-request
+    stops renewing its claim, so a retry can take the key over once the lease runs out.
+    """
+
+    def __init__(self, state: SharedState, max_entries: int, ttl_seconds: int, lease_seconds: float):
+        self.state = state
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        state.add_schema(
+            # Replaced by idempotency_records, which tracks the owner of in-progress claims
+            "DROP TABLE IF EXISTS idempotency_keys",
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_records (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                status TEXT NOT NULL,
+                response TEXT,
+                created_at REAL NOT NULL,
+                owner INTEGER,
+                claimed_at REAL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idempotency_records_created_at ON idempotency_records (created_at)",
+        )
+
+    def _evict(self, conn: sqlite3.Connection):
+        conn.execute(
+            "DELETE FROM idempotency_records WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        )
+        conn.execute(
+            """
+            DELETE FROM idempotency_records WHERE key IN (
+                SELECT key FROM idempotency_records ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def _get(self, conn: sqlite3.Connection, key: str) -> Optional[IdempotencyRecord]:
+        row = conn.execute(
+            "SELECT key, fingerprint, status, response, created_at, owner, claimed_at FROM idempotency_records WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return IdempotencyRecord(
+            key=row[0],
+            fingerprint=row[1],
+            status=row[2],
+            response=json.loads(row[3]) if row[3] is not None else None,
+            created_at=row[4],
+            owner=row[5],
+            claimed_at=row[6],
+        )
+
+    def claim(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        # One transaction, so two workers can't both claim the key
+        with self.state.transaction() as conn:
+            self._evict(conn)
+            now = time.time()
+            existing = self._get(conn, key)
+            if existing is not None:
+                if not _lease_expired(existing, self.lease_seconds, fingerprint):
+                    return existing
+                logger.warning(f"Taking over Idempotency-Key {key}, its claim by pid {existing.owner} was not renewed")
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency_records (key, fingerprint, status, created_at, owner, claimed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, fingerprint, IN_PROGRESS, now, os.getpid(), now),
+            )
+            return None
+
+    def renew(self, key: str):
+        with self.state.locked() as conn:
+            conn.execute(
+                "UPDATE idempotency_records SET claimed_at = ? WHERE key = ? AND status = ? AND owner = ?",
+                (time.time(), key, IN_PROGRESS, os.getpid()),
+            )
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        with self.state.locked() as conn:
+            record = self._get(conn, key)
+        if record is not None and record.created_at < time.time() - self.ttl_seconds:
+            return None
+        return record
+
+    def complete(self, key: str, fingerprint: str, response: Any):
+        with self.state.locked() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency_records (key, fingerprint, status, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, fingerprint, COMPLETED, json.dumps(response), time.time()),
+            )
+
+    def release(self, key: str):
+        with self.state.locked() as conn:
+            # A claim that was taken over belongs to the new owner now
+            conn.execute(
+                "DELETE FROM idempotency_records WHERE key = ? AND status = ? AND owner = ?",
+                (key, IN_PROGRESS, os.getpid()),
+            )
+
+
+class IdempotencyStore:
+    """
+    Runs POST handlers at most once per Idempotency-Key.
+
+    - A repeat of a completed request gets the stored response.
+    - A repeat of an in-progress request attaches to the running one and gets its result.
+    - A failed request is forgotten so the client can retry it with the same key.
+    - A request whose client disconnects still runs to completion and stores its response.
+    - A running request renews its claim every `heartbeat_interval`; a claim left behind by a
+      dead worker is taken over by the next retry once the backend's lease runs out.
+    """
+
+    def __init__(self, backend, wait_timeout: float, poll_interval: float = 0.5, heartbeat_interval: Optional[float] = None):
+        self.backend = backend
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval or backend.lease_seconds / 4
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def run(
+        self,
+        idempotency_key: Optional[str],
+        scope: str,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        if not idempotency_key:
+            return await handler()
+
+        key = f"{scope}:{idempotency_key}"
+        fingerprint = request_fingerprint(payload)
+        while True:
+            existing = await call_store(self.backend.claim, key, fingerprint)
+            if existing is None:
+                break
+            if existing.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key has already been used for a different request.",
+                )
+            if existing.status == COMPLETED:
+                logger.info(f"Replaying stored response for Idempotency-Key {idempotency_key} ({scope})")
+                return existing.response
+            logger.info(f"Attaching to in-progress request for Idempotency-Key {idempotency_key} ({scope})")
+            done, response = await self._wait(key)
+            if done:
+                return response
+            # The other worker stopped renewing its claim; try to take the key over
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be attached when the handler fails; don't log "exception was never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        # The handler runs in its own task, so a client disconnecting doesn't cancel the
+        # work that duplicates are attached to; its response is stored for the retry
+        work = asyncio.ensure_future(self._run_handler(key, fingerprint, handler, future))
+        work.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            return await asyncio.shield(work)
+        except asyncio.CancelledError:
+            if not work.done():
+                logger.info(f"Request with Idempotency-Key {idempotency_key} ({scope}) was cancelled, finishing it in the background")
+            raise
+
+    async def _run_handler(
+        self,
+        key: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Any]],
+        future: asyncio.Future,
+    ) -> Any:
+        heartbeat = asyncio.ensure_future(self._heartbeat(key))
+        try:
+            result = await handler()
+            response = result.model_dump(mode="json") if isinstance(result, BaseModel) else jsonable_encoder(result)
+            await call_store(self.backend.complete, key, fingerprint, response)
+            future.set_result(response)
+            return result
+        except asyncio.CancelledError:
+            await call_store(self.backend.release, key)
+            future.set_exception(HTTPException(
+                status_code=409,
+                detail="The original request with this Idempotency-Key was cancelled. Please retry.",
+            ))
+            raise
+        except BaseException as e:
+            await call_store(self.backend.release, key)
+            future.set_exception(e)
+            raise
+        finally:
+            heartbeat.cancel()
+            self._inflight.pop(key, None)
+
+    async def _heartbeat(self, key: str):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await call_store(self.backend.renew, key)
+            except Exception as e:
+                logger.warning(f"Could not renew the claim on Idempotency-Key {key}: {e}")
+
+    async def _wait(self, key: str) -> tuple[bool, Any]:
+        """(True, response) once the running request finishes, (False, None) if its claim lapsed."""
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                return True, await asyncio.wait_for(asyncio.shield(future), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress.",
+                )
+
+        # Claimed by another process sharing the SQLite backend; poll until it finishes
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            record = await call_store(self.backend.get, key)
+            if record is None:
+                raise HTTPException(
+                    status_code=409,
+                    detail="The original request with this Idempotency-Key failed. Please retry.",
+                )
+            if record.status == COMPLETED:
+                return True, record.response
+            if _lease_expired(record, self.backend.lease_seconds, record.fingerprint):
+                return False, None
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress.",
+        )
+
+
+def _build_backend():
+    if settings.IDEMPOTENCY_SQLITE_PATH or shared_state is not None:
+        state = SharedState(settings.IDEMPOTENCY_SQLITE_PATH) if settings.IDEMPOTENCY_SQLITE_PATH else shared_state
+        logger.info(f"Using SQLite idempotency store at {state.path}")
+        return SQLiteIdempotencyBackend(
+            state,
+            max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+            ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+            lease_seconds=settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS,
+        )
+    return MemoryIdempotencyBackend(
+        max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+        ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+        lease_seconds=settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS,
+    )
+
+
+# A claim not renewed for a whole wait timeout is taken to belong to a dead worker
+idempotency_store = IdempotencyStore(_build_backend(), wait_timeout=settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS)
@@ -0,0 +1,77 @@
+# agent_backend/app/core/rate_limit.py
+
+import asyncio
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from .shared_state import SharedState
+
+
+class TokenBucket:
+    """
+    Async token bucket: at most `rate_per_minute` acquisitions per minute on average,
+    with bursts of up to `burst`. Callers wait for a token instead of being rejected.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+        self.updated = now
+
+    async def acquire(self):
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate_per_second)
+                self._refill()
+            self.tokens -= 1
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose state lives in the shared SQLite database, so every worker
+    process draws from the same budget. Waiters are not ordered across processes.
+    """
+
+    def __init__(self, state: SharedState, name: str, rate_per_minute: float, burst: int = 1):
+        self.state = state
+        self.name = name
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        state.add_schema(
+            "CREATE TABLE IF NOT EXISTS rate_limits (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available; returns 0, or the seconds until the next token."""
+        with self.state.transaction() as conn:
+            row = conn.execute("SELECT tokens, updated FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            tokens = float(self.capacity) if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate_per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate_per_second
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (name, tokens, updated) VALUES (?, ?, ?)",
+                (self.name, tokens, now),
+            )
+        return wait
+
+    async def acquire(self):
+        while True:
+            # The transaction can wait on another worker's lock; keep that off the event loop
+            wait = await run_in_threadpool(self.try_acquire)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
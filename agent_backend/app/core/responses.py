@@ -0,0 +1,41 @@
+# agent_backend/app/core/responses.py
+
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError: # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+
+def dump_json(content: Any) -> bytes:
+    """Compact JSON bytes for a pydantic model or plain JSON-compatible data."""
+    if isinstance(content, BaseModel):
+        # pydantic-core serializes straight to bytes without building a dict first
+        return content.model_dump_json().encode("utf-8")
+    if orjson is not None:
+        try:
+            return orjson.dumps(content)
+        except TypeError:
+            content = jsonable_encoder(content)
+            return orjson.dumps(content)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for data that is already validated (e.g. agent output).
+
+    Returning a Response from an endpoint skips FastAPI's response_model
+    validation and serialization; response_model is still used for the docs.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
@@ -0,0 +1,101 @@
+# agent_backend/app/core/shared_state.py
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_open_lock = threading.Lock()
+
+
+class SharedState:
+    """
+    A SQLite database in WAL mode, shared by every worker process of a deployment.
+
+    Each process opens its own connection on first use, so the object can be created at
+    import time in the gunicorn master (preload_app) and used after the workers fork.
+    Components register their tables with `add_schema`; the statements run on every
+    new connection and must be idempotent.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 10.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._schema: List[str] = []
+        self._pid: Optional[int] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def add_schema(self, *statements: str):
+        self._schema.extend(statements)
+        if self._conn is not None and self._pid == os.getpid():
+            with self._lock:
+                for statement in statements:
+                    self._conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps the database consistent on a crash; NORMAL only risks the last commits on power loss
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self._schema:
+            conn.execute(statement)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            with _open_lock:
+                # First use in this process (or a freshly forked worker): never reuse the parent's handle
+                if self._pid != os.getpid():
+                    self._lock = threading.RLock()
+                    self._conn = self._connect()
+                    self._pid = os.getpid()
+                    logger.info(f"Opened shared state {self.path} in process {self._pid}")
+        return self._conn
+
+    @contextmanager
+    def locked(self) -> Iterator[sqlite3.Connection]:
+        """The process's connection, serialized between threads; statements autocommit."""
+        conn = self.connection()
+        with self._lock:
+            yield conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """A write transaction; other processes wait (up to busy_timeout) until it commits."""
+        conn = self.connection()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+
+async def call_store(method: Callable[..., Any], *args) -> Any:
+    """
+    Calls a store method from async code. Stores backed by SharedState (those with a
+    `state` attribute) can wait up to busy_timeout for another worker's write lock, so
+    their methods run in the threadpool instead of blocking the event loop. In-memory
+    stores are not thread-safe and are called directly.
+    """
+    if isinstance(getattr(getattr(method, "__self__", None), "state", None), SharedState):
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+# None when running a single process; components then keep their state in memory
+shared_state = SharedState(settings.SHARED_STATE_PATH) if settings.SHARED_STATE_PATH else None
@@ -5,9 +5,13 @@ from fastapi.middleware.cors import CORSMiddleware
 
 # Import the configuration object (ensure it loads .env)
 from .core.config import settings
+from .core.compression import CompressionMiddleware
+from .core.responses import FastJSONResponse
 # Import the API router
 from .api.endpoints import generation
 from .api.endpoints import upload # Import the new upload router
+from .api.endpoints import study_plans
+from .api.endpoints import pdf_export
 
 # Set up logging
 logging.basicConfig(
@@ -26,7 +30,8 @@ if not settings.OPENAI_API_KEY:
 app = FastAPI(
     title="CramPlan API",
     description="API for generating learning content and study plans.",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=FastJSONResponse,
 )
 
 # --- CORS Configuration --- 
@@ -46,10 +51,17 @@ app.add_middleware(
 )
 # --- End CORS Configuration ---
 
+# Compress large JSON responses (study content runs to thousands of words)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.RESPONSE_COMPRESSION_MIN_SIZE)
+
 # Include the generation API router without the prefix
 app.include_router(generation.router, tags=["Generation"])
 # Include the upload API router 
 app.include_router(upload.router, tags=["Upload"]) # No prefix here either to match frontend
+# Include the stored study plan router
+app.include_router(study_plans.router, tags=["Study Plans"])
+# Include the PDF export router (called by the study plan page's download button)
+app.include_router(pdf_export.router, tags=["PDF Export"])
 
 # Simple root endpoint
 @app.get("/")
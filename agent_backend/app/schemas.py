@@ -0,0 +1,53 @@
+# agent_backend/app/schemas.py
+
+# Shared models for agent outputs and API payloads.
+# The agents validate their output against these, so endpoints can return
+# agent output as-is instead of copying it into a parallel set of models.
+
+from pydantic import BaseModel
+
+
+class Topic(BaseModel):
+    topic: str
+    description: str
+    subtopics: list[str]
+
+
+class ListOfTopics(BaseModel):
+    list_of_topics: list[Topic]
+
+
+class QuizQuestions(BaseModel):
+    topic: str
+    quiz_question: str
+    choice_a: str
+    choice_b: str
+    choice_c: str
+    choice_d: str
+    correct_answer: str
+
+
+class ListOfQuizQuestions(BaseModel):
+    list_quiz_questions: list[QuizQuestions]
+
+
+class ContentSub(BaseModel):
+    sub_topic_title: str
+    sub_content_text: str
+
+
+class ContentMain(BaseModel):
+    topic_title: str
+    main_description: str
+    subtopics: list[ContentSub]
+
+
+class ContentTopic(BaseModel):
+    topic: list[ContentMain]
+
+
+# API names for the same models
+TopicResponse = ListOfTopics
+QuizQuestion = QuizQuestions
+QuizResponse = ListOfQuizQuestions
+ContentResponse = ContentTopic
@@ -0,0 +1,274 @@
+# agent_backend/app/services/dag.py
+
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel, TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    `fn` is called with the values named in `inputs` (positionally, in order) and its
+    result is published as `output`. With `fan_out`, `fn` is instead called once per
+    item of `fan_out(*inputs)`, each call being its own checkpointed node, and `output`
+    is the list of results. Bump `version` when the stage's prompt or logic changes so
+    old checkpoints are not reused.
+    """
+    name: str
+    fn: Callable[..., Any]
+    inputs: List[str]
+    output: str
+    output_type: Optional[Type] = None # Used to rebuild checkpointed output; None keeps plain JSON
+    fan_out: Optional[Callable[..., list]] = None
+    checkpoint: bool = True
+    version: str = "1"
+
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    return value
+
+
+def input_hash(stage: Stage, args: tuple) -> str:
+    encoded = json.dumps(
+        {"stage": stage.name, "version": stage.version, "inputs": _to_jsonable(list(args))},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    Stage outputs on local disk, one JSON file per (stage, input hash).
+
+    With `max_age_seconds`, older checkpoints are ignored and deleted by an occasional
+    sweep on save, so the store doesn't grow with runs that were never retried.
+    """
+
+    def __init__(self, root_dir: str, max_age_seconds: Optional[float] = None):
+        self.root_dir = root_dir
+        self.max_age_seconds = max_age_seconds
+        self._last_prune = 0.0
+
+    def _path(self, stage_name: str, key: str) -> str:
+        return os.path.join(self.root_dir, stage_name, f"{key}.json")
+
+    def _expired(self, path: str) -> bool:
+        return self.max_age_seconds is not None and os.path.getmtime(path) < time.time() - self.max_age_seconds
+
+    def load(self, stage: Stage, key: str):
+        """Returns (found, value)."""
+        path = self._path(stage.name, key)
+        try:
+            if self._expired(path):
+                return False, None
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False, None
+        if stage.output_type is not None:
+            return True, TypeAdapter(stage.output_type).validate_python(data)
+        return True, data
+
+    def save(self, stage: Stage, key: str, value: Any):
+        directory = os.path.join(self.root_dir, stage.name)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(_to_jsonable(value), f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(stage.name, key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.max_age_seconds is not None and time.monotonic() - self._last_prune > min(self.max_age_seconds, 600):
+            self.prune()
+
+    def discard(self, run: "DagRun"):
+        """Deletes the checkpoints a finished run wrote or restored."""
+        for stage_name, key in run.checkpoint_keys:
+            try:
+                os.remove(self._path(stage_name, key))
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Deletes checkpoints older than `max_age_seconds`."""
+        self._last_prune = time.monotonic()
+        if self.max_age_seconds is None or not os.path.isdir(self.root_dir):
+            return
+        removed = 0
+        for stage_dir in os.scandir(self.root_dir):
+            if not stage_dir.is_dir():
+                continue
+            for entry in os.scandir(stage_dir.path):
+                try:
+                    if self._expired(entry.path):
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError: # Removed concurrently
+                    pass
+        if removed:
+            logger.info(f"Pruned {removed} expired checkpoints from {self.root_dir}")
+
+
+@dataclass
+class NodeResult:
+    node: str
+    status: str # "ran", "checkpoint" or "failed"
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class StageFailed(RuntimeError):
+    def __init__(self, stage: str, cause: BaseException):
+        super().__init__(f"Stage '{stage}' failed: {cause}")
+        self.stage = stage
+        self.cause = cause
+
+
+@dataclass
+class DagRun:
+    values: Dict[str, Any]
+    nodes: List[NodeResult] = field(default_factory=list)
+    checkpoint_keys: List[tuple] = field(default_factory=list) # (stage name, input hash) of checkpointed nodes
+
+    @property
+    def skipped(self) -> int:
+        return sum(1 for n in self.nodes if n.status == "checkpoint")
+
+
+class DagExecutor:
+    """
+    Runs stages as soon as their inputs are available, so independent stages overlap.
+
+    Completed stage outputs are checkpointed by input hash; rerunning the same DAG with
+    the same inputs skips every stage that already finished. When a stage fails, the
+    stages that don't depend on it still run (and checkpoint) before the error is raised.
+    """
+
+    def __init__(self, stages: List[Stage], checkpoints: Optional[CheckpointStore] = None):
+        self.stages = stages
+        self.checkpoints = checkpoints
+        self._validate()
+
+    def _validate(self):
+        outputs = {}
+        for stage in self.stages:
+            if stage.output in outputs:
+                raise ValueError(f"Value '{stage.output}' is produced by both '{outputs[stage.output]}' and '{stage.name}'")
+            outputs[stage.output] = stage.name
+
+        # Reject cycles: repeatedly peel off stages whose inputs come from outside the DAG or peeled stages
+        remaining = {stage.name: stage for stage in self.stages}
+        available = set()
+        while remaining:
+            ready = [
+                s for s in remaining.values()
+                if all(i not in outputs or i in available for i in s.inputs)
+            ]
+            if not ready:
+                raise ValueError(f"Cycle between stages: {', '.join(remaining)}")
+            for stage in ready:
+                available.add(stage.output)
+                del remaining[stage.name]
+
+    async def _call(self, stage: Stage, node: str, args: tuple, run: DagRun):
+        key = input_hash(stage, args)
+        if self.checkpoints is not None and stage.checkpoint:
+            run.checkpoint_keys.append((stage.name, key))
+            found, value = self.checkpoints.load(stage, key)
+            if found:
+                run.nodes.append(NodeResult(node=node, status="checkpoint"))
+                return value
+
+        started = time.monotonic()
+        try:
+            value = stage.fn(*args)
+            if inspect.isawaitable(value):
+                value = await value
+        except Exception as e:
+            run.nodes.append(NodeResult(node=node, status="failed", seconds=time.monotonic() - started, error=str(e)))
+            raise
+
+        run.nodes.append(NodeResult(node=node, status="ran", seconds=time.monotonic() - started))
+        if self.checkpoints is not None and stage.checkpoint:
+            self.checkpoints.save(stage, key, value)
+        return value
+
+    async def _run_stage(self, stage: Stage, futures: Dict[str, asyncio.Future], run: DagRun):
+        try:
+            args = tuple([await futures[name] for name in stage.inputs])
+        except StageFailed as e:
+            futures[stage.output].set_exception(e)
+            return
+
+        try:
+            if stage.fan_out is None:
+                value = await self._call(stage, stage.name, args, run)
+            else:
+                items = list(stage.fan_out(*args))
+                results = await asyncio.gather(
+                    *[self._call(stage, f"{stage.name}[{i}]", (item,), run) for i, item in enumerate(items)],
+                    return_exceptions=True,
+                )
+                errors = [r for r in results if isinstance(r, BaseException)]
+                if errors:
+                    raise errors[0]
+                value = results
+        except Exception as e:
+            logger.error(f"DAG stage '{stage.name}' failed: {e}")
+            futures[stage.output].set_exception(StageFailed(stage.name, e))
+            return
+        futures[stage.output].set_result(value)
+
+    async def run(self, initial: Dict[str, Any]) -> DagRun:
+        loop = asyncio.get_running_loop()
+        futures: Dict[str, asyncio.Future] = {}
+        for name, value in initial.items():
+            futures[name] = loop.create_future()
+            futures[name].set_result(value)
+        for stage in self.stages:
+            futures[stage.output] = loop.create_future()
+        for stage in self.stages:
+            for name in stage.inputs:
+                if name not in futures:
+                    raise ValueError(f"Stage '{stage.name}' needs '{name}', which is neither an input nor a stage output")
+
+        run = DagRun(values={})
+        await asyncio.gather(*[self._run_stage(stage, futures, run) for stage in self.stages])
+
+        # Dependents re-raise their upstream failure; report the stage that actually failed first
+        failures = [
+            futures[stage.output].exception() for stage in self.stages
+            if futures[stage.output].exception() is not None
+            and futures[stage.output].exception().stage == stage.name
+        ]
+        if failures:
+            raise failures[0]
+        run.values = {name: future.result() for name, future in futures.items()}
+
+        ran = sum(1 for n in run.nodes if n.status == "ran")
+        logger.info(f"DAG finished: {ran} nodes ran, {run.skipped} restored from checkpoints")
+        return run
@@ -12,6 +12,16 @@ from agents import Agent, Runner, function_tool, trace, FileSearchTool, WebSearc
 
 # Import settings from the new config location
 from ..core.config import settings
+# Agent output models live in the shared schema module
+from ..schemas import (
+    Topic,
+    ListOfTopics,
+    QuizQuestions,
+    ListOfQuizQuestions,
+    ContentSub,
+    ContentMain,
+    ContentTopic,
+)
 
 # Ensure the API key is set for the agents library
 # This depends on how the 'agents' library expects the key (e.g., environment variable, direct configuration)
@@ -19,14 +29,6 @@ from ..core.config import settings
 os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
 
 
-class Topic(BaseModel):
-    topic: str
-    description: str
-    subtopics: list[str]
-
-class ListOfTopics(BaseModel):
-    list_of_topics: list[Topic]  # Now it's a list of strings
-
 main_topic_outline_agent = Agent(
     name="main_topic_outline_agent",
     instructions="""
@@ -56,38 +58,17 @@ curated_topic_outline_agent = Agent(
     output_type=ListOfTopics
 )
 
-class QuizQuestions(BaseModel):
-     topic: str
-     quiz_question: str
-     choice_a: str
-     choice_b: str
-     choice_c: str
-     choice_d: str
-     correct_answer: str
-
-class ListOfQuizQuestions(BaseModel):
-     list_quiz_questions: list[QuizQuestions]
-
-
 open_quiz_agent = Agent(
     name="open_quiz_agent",
     instructions="Read the given list of topics, and create 10 multiple choice quiz of a,b,c,d that covers all the topics. The correct answer should be a,b,c,d",
     output_type=ListOfQuizQuestions,
 )
 
-class ContentSub(BaseModel):
-    sub_topic_title: str
-    sub_content_text: str
-
-class ContentMain(BaseModel):
-    topic_title: str
-    main_description: str
-    subtopics: list[ContentSub]
-
-class ContentTopic(BaseModel):
-     topic: list[ContentMain] 
-
-
+topic_quiz_agent = Agent(
+    name="topic_quiz_agent",
+    instructions="Read the given topic and create the requested number of multiple choice questions of a,b,c,d about it. Each question should test a different subtopic or idea. The correct answer should be a,b,c,d",
+    output_type=ListOfQuizQuestions,
+)
 
 content_writer_agent = Agent(
     name="content_writer_agent",
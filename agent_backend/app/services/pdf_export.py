@@ -0,0 +1,472 @@
+# agent_backend/app/services/pdf_export.py
+
+# Pure-Python PDF export for study plans.
+#
+# Content is turned into a lazy stream of blocks (headings, paragraphs, bullets,
+# code), laid out one page at a time and written out as PDF objects while the
+# pages are produced, so memory use stays flat no matter how long the plan is.
+# Only the 14 standard PDF fonts are used, so nothing is embedded and no native
+# libraries are needed.
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+from ..core.config import settings
+from ..schemas import ContentMain
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so cached PDFs are re-rendered
+RENDERER_VERSION = "1"
+
+PAGE_WIDTH = 595.0 # A4, in points
+PAGE_HEIGHT = 842.0
+MARGIN = 56.0
+FOOTER_Y = 30.0
+
+FONT_REGULAR = "F1"
+FONT_BOLD = "F2"
+FONT_MONO = "F3"
+BASE_FONTS = {FONT_REGULAR: "Helvetica", FONT_BOLD: "Helvetica-Bold", FONT_MONO: "Courier"}
+
+# Advance widths (1/1000 em) of printable ASCII, from the standard Helvetica AFM files
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+# WinAnsi punctuation that LLM output uses a lot (bullet, dashes, curly quotes)
+_WINANSI_EXTRA = {0x95: 350, 0x96: 556, 0x97: 1000, 0x91: 222, 0x92: 222, 0x93: 333, 0x94: 333, 0x85: 1000}
+_WIDTHS = {FONT_REGULAR: _HELVETICA, FONT_BOLD: _HELVETICA_BOLD}
+
+
+@dataclass(frozen=True)
+class Style:
+    font: str
+    size: float
+    leading: float
+    space_before: float
+    color: str = "0 0 0"
+    indent: float = 0.0
+
+
+STYLES = {
+    "title": Style(FONT_BOLD, 22, 28, 0, "0.10 0.20 0.45"),
+    "h1": Style(FONT_BOLD, 17, 22, 18, "0.10 0.20 0.45"),
+    "h2": Style(FONT_BOLD, 13.5, 18, 12, "0.15 0.15 0.15"),
+    "h3": Style(FONT_BOLD, 11.5, 15, 8, "0.15 0.15 0.15"),
+    "para": Style(FONT_REGULAR, 10.5, 14.5, 6),
+    "bullet": Style(FONT_REGULAR, 10.5, 14.5, 2, indent=14),
+    "code": Style(FONT_MONO, 9, 11.5, 0, "0.20 0.20 0.20", indent=8),
+}
+HEADINGS = ("title", "h1", "h2", "h3")
+
+
+@dataclass
+class Block:
+    kind: str # A key of STYLES
+    text: str
+    marker: str = "" # Bullet or list number, drawn in the indent
+
+
+# --- Text encoding and measurement ---
+
+# Stand-ins for math symbols that WinAnsi lacks
+_FALLBACKS = {"λ": "lambda", "Λ": "Lambda", "−": "-", "→": "->", "←": "<-", "⇒": "=>", "≤": "<=", "≥": ">=", "≠": "!=", "≈": "~", "∞": "inf", "√": "sqrt"}
+
+
+def _transliterate(char: str) -> bytes:
+    if char in _FALLBACKS:
+        return _FALLBACKS[char].encode("ascii")
+    name = unicodedata.name(char, "")
+    if name.startswith("GREEK"):
+        letter = name.rsplit(" ", 1)[-1].lower()
+        return (letter.capitalize() if "CAPITAL" in name else letter).encode("ascii")
+    return unicodedata.normalize("NFKD", char).encode("ascii", "ignore") or b"?"
+
+
+def encode_text(text: str) -> bytes:
+    """WinAnsi bytes for a standard font; characters it can't show are transliterated."""
+    out = bytearray()
+    for char in text:
+        try:
+            out += char.encode("cp1252")
+        except UnicodeEncodeError:
+            out += _transliterate(char)
+    return bytes(out)
+
+
+def _char_units(byte: int, font: str) -> int:
+    """Advance width of one WinAnsi byte in 1/1000 of the font size."""
+    if font == FONT_MONO:
+        return 600
+    if 32 <= byte <= 126:
+        return _WIDTHS[font][byte - 32]
+    return _WINANSI_EXTRA.get(byte, 556)
+
+
+def text_width(data: bytes, font: str, size: float) -> float:
+    if font == FONT_MONO:
+        return len(data) * 600 * size / 1000
+    return sum(_char_units(byte, font) for byte in data) * size / 1000
+
+
+def _split_word(word: bytes, font: str, size: float, max_width: float) -> List[bytes]:
+    """Splits a word wider than a line in one pass; every piece but the last fills a line."""
+    limit = max_width * 1000 / size
+    pieces: List[bytes] = []
+    start, units = 0, 0
+    for i, byte in enumerate(word):
+        char = _char_units(byte, font)
+        if units + char > limit and i > start:
+            pieces.append(word[start:i])
+            start, units = i, 0
+        units += char
+    pieces.append(word[start:])
+    return pieces
+
+
+def wrap(data: bytes, font: str, size: float, max_width: float) -> List[bytes]:
+    """Greedy word wrap; words wider than a line are split."""
+    lines: List[bytes] = []
+    space = text_width(b" ", font, size)
+    line, line_width = b"", 0.0
+    for word in data.split():
+        word_width = text_width(word, font, size)
+        if word_width > max_width:
+            if line:
+                lines.append(line)
+                line, line_width = b"", 0.0
+            *full, word = _split_word(word, font, size, max_width)
+            lines.extend(full)
+            word_width = text_width(word, font, size)
+        if line and line_width + space + word_width > max_width:
+            lines.append(line)
+            line, line_width = b"", 0.0
+        if line:
+            line, line_width = line + b" " + word, line_width + space + word_width
+        else:
+            line, line_width = word, word_width
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(data: bytes) -> bytes:
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+# --- Blocks from markdown and from ContentResponse ---
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_BULLET = re.compile(r"^\s*([-*+•])\s+(.*)$")
+_NUMBERED = re.compile(r"^\s*(\d+[.)])\s+(.*)$")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_EMPHASIS = re.compile(r"(\*\*|__|\*|`)")
+
+
+def _inline(text: str) -> str:
+    return _EMPHASIS.sub("", _LINK.sub(r"\1", text)).strip()
+
+
+def markdown_blocks(lines: Iterable[str], heading_offset: int = 0) -> Iterator[Block]:
+    """
+    Blocks for the subset of markdown the study plans use: ATX headings, bullet and
+    numbered lists, fenced code and paragraphs. Inline markup is stripped.
+    `heading_offset` demotes headings when the markdown is nested under another heading.
+    """
+    paragraph: List[str] = []
+    in_code = False
+
+    def flush():
+        if paragraph:
+            text = _inline(" ".join(paragraph))
+            paragraph.clear()
+            if text:
+                return Block("para", text)
+        return None
+
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line.strip().startswith("```"):
+            block = flush()
+            if block:
+                yield block
+            in_code = not in_code
+            continue
+        if in_code:
+            yield Block("code", line.expandtabs(4))
+            continue
+        if not line.strip():
+            block = flush()
+            if block:
+                yield block
+            continue
+
+        heading = _HEADING.match(line.strip())
+        bullet = _BULLET.match(line)
+        numbered = _NUMBERED.match(line)
+        if heading or bullet or numbered:
+            block = flush()
+            if block:
+                yield block
+        if heading:
+            level = min(len(heading.group(1)) + heading_offset, 3)
+            yield Block(f"h{level}", _inline(heading.group(2)))
+        elif bullet:
+            yield Block("bullet", _inline(bullet.group(2)), marker="•")
+        elif numbered:
+            yield Block("bullet", _inline(numbered.group(2)), marker=numbered.group(1))
+        else:
+            paragraph.append(line.strip())
+
+    block = flush()
+    if block:
+        yield block
+
+
+def content_blocks(title: str, topics: Iterable[ContentMain]) -> Iterator[Block]:
+    """Blocks for a study plan; `topics` may be a lazy iterable, e.g. topics read one by one from the store."""
+    yield Block("title", title)
+    for topic in topics:
+        yield Block("h1", topic.topic_title)
+        yield from markdown_blocks(topic.main_description.splitlines(), heading_offset=2)
+        for sub in topic.subtopics:
+            yield Block("h2", sub.sub_topic_title)
+            yield from markdown_blocks(sub.sub_content_text.splitlines(), heading_offset=2)
+
+
+# --- Layout ---
+
+def layout_pages(blocks: Iterable[Block]) -> Iterator[bytes]:
+    """Yields the content stream of each page as soon as it is full."""
+    top = PAGE_HEIGHT - MARGIN
+    bottom = MARGIN
+    ops: List[bytes] = []
+    y = top
+    page_number = 1
+
+    def finish_page() -> bytes:
+        nonlocal ops, y, page_number
+        footer = encode_text(str(page_number))
+        x = (PAGE_WIDTH - text_width(footer, FONT_REGULAR, 9)) / 2
+        ops.append(b"0.5 0.5 0.5 rg BT /%s 9 Tf %.2f %.2f Td %s Tj ET" % (
+            FONT_REGULAR.encode(), x, FOOTER_Y, _pdf_string(footer)))
+        stream = b"\n".join(ops)
+        ops, y = [], top
+        page_number += 1
+        return stream
+
+    def show(font: str, size: float, x: float, baseline: float, data: bytes) -> bytes:
+        return b"BT /%s %.1f Tf %.2f %.2f Td %s Tj ET" % (font.encode(), size, x, baseline, _pdf_string(data))
+
+    for block in blocks:
+        style = STYLES[block.kind]
+        marker = encode_text(block.marker) if block.marker else b""
+        indent = style.indent
+        if marker:
+            # Markers hang in the indent, right-aligned against the text
+            indent = max(indent, text_width(marker, style.font, style.size) + 4)
+        x = MARGIN + indent
+        max_width = PAGE_WIDTH - MARGIN - x
+        if block.kind == "code":
+            # Keep indentation; hard-wrap at the line width
+            data = encode_text(block.text)
+            per_line = max(1, int(max_width / text_width(b" ", style.font, style.size)))
+            lines = [data[i:i + per_line] for i in range(0, len(data), per_line)] or [b""]
+        else:
+            lines = wrap(encode_text(block.text), style.font, style.size, max_width) or [b""]
+
+        needed = style.space_before + style.leading
+        if block.kind in HEADINGS:
+            # Keep a heading together with at least two lines of what follows
+            needed += 2 * STYLES["para"].leading
+        if y != top:
+            if y - needed < bottom:
+                yield finish_page()
+            else:
+                y -= style.space_before
+
+        for index, line in enumerate(lines):
+            if y - style.leading < bottom:
+                yield finish_page()
+            y -= style.leading
+            baseline = y + (style.leading - style.size) / 2
+            text_ops = show(style.font, style.size, x, baseline, line)
+            if index == 0 and marker:
+                marker_x = x - 4 - text_width(marker, style.font, style.size)
+                text_ops += b" " + show(style.font, style.size, marker_x, baseline, marker)
+            ops.append(style.color.encode() + b" rg " + text_ops)
+
+    yield finish_page()
+
+
+# --- PDF writer ---
+
+class _Writer:
+    """Tracks byte offsets of objects as they are emitted, for the xref table."""
+
+    def __init__(self):
+        self.position = 0
+        self.offsets = {}
+
+    def emit(self, data: bytes) -> bytes:
+        self.position += len(data)
+        return data
+
+    def obj(self, number: int, body: bytes) -> bytes:
+        self.offsets[number] = self.position
+        return self.emit(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+
+def render_pdf(title: str, blocks: Iterable[Block]) -> Iterator[bytes]:
+    """Yields the PDF in chunks of roughly one page; only the page being laid out is held in memory."""
+    writer = _Writer()
+    catalog, pages_root, info = 1, 2, 3
+    font_objects = {name: 4 + i for i, name in enumerate(BASE_FONTS)}
+    next_object = 4 + len(BASE_FONTS)
+
+    header = writer.emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    header += writer.obj(catalog, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_root)
+    header += writer.obj(info, b"<< /Title %s /Producer (CramPlan) >>" % _pdf_string(encode_text(title)))
+    for name, number in font_objects.items():
+        header += writer.obj(number, b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % BASE_FONTS[name].encode())
+    yield header
+
+    fonts = b" ".join(b"/%s %d 0 R" % (name.encode(), number) for name, number in font_objects.items())
+    page_objects = []
+    for stream in layout_pages(blocks):
+        compressed = zlib.compress(stream, 6)
+        content, page = next_object, next_object + 1
+        next_object += 2
+        page_objects.append(page)
+        chunk = writer.obj(content, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(compressed) + compressed + b"\nendstream")
+        chunk += writer.obj(page, (
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << /Font << %s >> >> /Contents %d 0 R >>"
+            % (pages_root, PAGE_WIDTH, PAGE_HEIGHT, fonts, content)
+        ))
+        yield chunk
+
+    kids = b" ".join(b"%d 0 R" % number for number in page_objects)
+    tail = writer.obj(pages_root, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_objects)))
+    xref_offset = writer.position
+    xref = [b"xref\n0 %d\n" % next_object, b"0000000000 65535 f \n"]
+    xref += [b"%010d 00000 n \n" % writer.offsets[number] for number in range(1, next_object)]
+    tail += writer.emit(b"".join(xref))
+    tail += writer.emit(
+        b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (next_object, catalog, info, xref_offset)
+    )
+    yield tail
+
+
+# --- Cache of finished PDFs ---
+
+def pdf_cache_key(kind: str, title: str, source: bytes) -> str:
+    """Content hash of what a PDF is rendered from. For study plans `source` is the plan's content hash."""
+    digest = hashlib.sha256(f"{RENDERER_VERSION}\0{kind}\0{title}\0".encode("utf-8"))
+    digest.update(source)
+    return digest.hexdigest()
+
+
+# Temp files older than this are left over from a crashed render
+STALE_TMP_SECONDS = 60 * 60
+
+
+class PdfCache:
+    """
+    Finished PDFs on disk, one file per content hash. A file's mtime is refreshed when it
+    is served, and the least recently served files are deleted beyond `max_total_bytes`.
+    """
+
+    def __init__(self, root_dir: str, max_total_bytes: Optional[int] = None):
+        self.root_dir = root_dir
+        self.max_total_bytes = max_total_bytes
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root_dir, key[:2], f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store_while_streaming(self, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Passes `chunks` through while writing them to the cache; a cut-short stream is not cached."""
+        directory = os.path.dirname(self.path(key))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        completed = False
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            os.replace(tmp_path, self.path(key))
+            completed = True
+            logger.info(f"Cached PDF {key[:12]} ({size} bytes)")
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict(keep=key)
+
+    def _evict(self, keep: str):
+        """Deletes the least recently served PDFs beyond `max_total_bytes`, and temp files of crashed renders."""
+        now = time.time()
+        files = []
+        total = 0
+        for directory in os.scandir(self.root_dir):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                try:
+                    stat = entry.stat()
+                    if entry.name.endswith(".tmp"):
+                        if stat.st_mtime < now - STALE_TMP_SECONDS:
+                            os.remove(entry.path)
+                        continue
+                except FileNotFoundError: # Evicted by another worker meanwhile
+                    continue
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+                total += stat.st_size
+        if self.max_total_bytes is None:
+            return
+        keep_path = self.path(keep)
+        for _, path, size in sorted(files):
+            if total <= self.max_total_bytes:
+                break
+            if path == keep_path:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            logger.info(f"Evicted cached PDF {os.path.basename(path)[:12]} ({size} bytes)")
+
+
+pdf_cache = PdfCache(settings.PDF_CACHE_DIR, max_total_bytes=settings.PDF_CACHE_MAX_BYTES)
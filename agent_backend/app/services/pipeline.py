@@ -0,0 +1,234 @@
+# agent_backend/app/services/pipeline.py
+
+# The individual agent steps of the study plan pipeline, shared by the API
+# endpoints and the offline batch runner (llm_main.py). Each step builds the
+# prompt, runs its agent and returns the validated output. Caching, admission
+# control and HTTP error handling are left to the callers. Prompts are laid out
+# and compacted by app.services.prompts.
+#
+# The *_stages() helpers wire the steps into a DAG for app.services.dag.
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .llm_service import (
+    main_topic_outline_agent,
+    open_quiz_agent,
+    topic_quiz_agent,
+    content_writer_agent,
+    curated_topic_outline_agent,
+    Runner,
+)
+from .dag import Stage
+from .question_bank import question_bank, topic_key, validate_question
+from ..core.config import settings
+from ..core.shared_state import call_store
+from .prompts import agent_budget, build_prompt, compact_topics, truncate_to_tokens
+from ..schemas import ContentMain, ListOfQuizQuestions, ListOfTopics, Topic
+
+logger = logging.getLogger(__name__)
+
+# Runs a pipeline step under the caller's budget, e.g. `await guard(generate_topics, subject)`
+Guard = Callable[..., Awaitable[Any]]
+
+
+class PipelineError(RuntimeError):
+    """An agent returned output the pipeline cannot use."""
+
+
+def format_topics(topics: ListOfTopics) -> str:
+    return "\n".join(
+        f"{i+1}. {topic.topic}\n   Description: {topic.description}\n   Subtopics: {', '.join(topic.subtopics)}"
+        for i, topic in enumerate(topics.list_of_topics)
+    )
+
+
+# Static task text goes first in every prompt so calls to the same agent share a prefix
+QUIZ_TASK = "Here are the topics:"
+CURATE_TASK = "Main topic and the user's understanding (% correct) of each topic:"
+TOPIC_QUIZ_TASK = "Create multiple choice questions for the topic below."
+CONTENT_TASK = "Write content for the topic below. You need to output the main content, its description and the subtopics with the content for each subtopic."
+
+
+async def generate_topics(subject: str) -> ListOfTopics:
+    subject = " ".join(subject.split())
+    prompt = build_prompt(
+        main_topic_outline_agent,
+        task="",
+        payload=truncate_to_tokens(subject, agent_budget(main_topic_outline_agent.name)),
+    )
+    result = await Runner.run(main_topic_outline_agent, prompt.text)
+    return result.final_output
+
+
+async def generate_quiz(topics: ListOfTopics) -> ListOfQuizQuestions:
+    prompt = build_prompt(
+        open_quiz_agent,
+        task=QUIZ_TASK,
+        payload=compact_topics(topics.list_of_topics, agent_budget(open_quiz_agent.name)),
+        baseline=f"Here are the topics:\n{format_topics(topics)}",
+    )
+    result = await Runner.run(open_quiz_agent, prompt.text)
+    return result.final_output
+
+
+async def generate_topic_questions(topic: Topic, count: int) -> ListOfQuizQuestions:
+    prompt = build_prompt(
+        topic_quiz_agent,
+        task=TOPIC_QUIZ_TASK,
+        payload=f"Number of questions: {count}\n"
+        + compact_topics([topic], agent_budget(topic_quiz_agent.name), numbered=False),
+    )
+    result = await Runner.run(topic_quiz_agent, prompt.text)
+    return result.final_output
+
+
+def balanced_counts(available: List[int], total: int) -> List[int]:
+    """Deals `total` questions round-robin over the topics, skipping topics that have run out."""
+    counts = [0] * len(available)
+    remaining = total
+    while remaining > 0 and any(c < a for c, a in zip(counts, available)):
+        for i in range(len(counts)):
+            if remaining and counts[i] < available[i]:
+                counts[i] += 1
+                remaining -= 1
+    return counts
+
+
+async def assemble_quiz(topics: ListOfTopics, guard: Guard, scope: Optional[str] = None) -> ListOfQuizQuestions:
+    """
+    Builds a quiz from the question bank with balanced coverage of `topics`. Only topics
+    with too few banked questions are sent to the agent, concurrently and one per call.
+    `scope` (the material set id, or the subject) keeps same-named topics of different
+    courses apart.
+    """
+    total = settings.QUIZ_QUESTION_COUNT
+    unique: Dict[str, Topic] = {}
+    for topic in topics.list_of_topics:
+        unique.setdefault(topic_key(scope, topic.topic), topic)
+    keys = list(unique)
+    wanted = balanced_counts([total] * len(keys), total)
+
+    async def fill(key: str, want: int):
+        topic = unique[key]
+        count = max(want - banked[key], settings.QUESTION_BANK_GENERATE_PER_TOPIC)
+        generated = await guard(generate_topic_questions, topic, count)
+        valid = [q for q in (validate_question(q, topic.topic) for q in generated.list_quiz_questions) if q is not None]
+        await call_store(question_bank.add, key, valid)
+
+    banked = {key: await call_store(question_bank.count, key) for key in keys}
+    missing = [(key, want) for key, want in zip(keys, wanted) if banked[key] < want]
+    results = await asyncio.gather(*[fill(key, want) for key, want in missing], return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    logger.info(f"Quiz for {len(keys)} topics: {len(keys) - len(missing)} served from the question bank, {len(missing)} generated")
+
+    # Topics that came back short are topped up from the others
+    counts = balanced_counts([await call_store(question_bank.count, key) for key in keys], total)
+    for (key, want), count in zip(zip(keys, wanted), counts):
+        if want and not count:
+            if errors:
+                raise errors[0]
+            raise PipelineError(f"No usable quiz questions for topic: {unique[key].topic}")
+    if errors:
+        logger.warning(f"Question generation failed for {len(errors)} topics, using banked questions instead: {errors[0]}")
+
+    # Banked questions carry the title they were generated under, which may be worded
+    # differently; scores are keyed by the titles of this topic list
+    questions = []
+    for key, count in zip(keys, counts):
+        for question in await call_store(question_bank.take, key, count):
+            questions.append(question.model_copy(update={"topic": unique[key].topic}))
+    return ListOfQuizQuestions(list_quiz_questions=questions)
+
+
+async def curate_topics(subject: str, scores: Dict[str, float]) -> ListOfTopics:
+    budget = agent_budget(curated_topic_outline_agent.name)
+    main_topic = truncate_to_tokens(" ".join(subject.split()), budget // 4)
+    # Lowest understanding first, which is also the order the agent is asked to return
+    understanding = "\n".join(
+        f"{topic}: {score:.0f}%" for topic, score in sorted(scores.items(), key=lambda item: item[1])
+    )
+    prompt = build_prompt(
+        curated_topic_outline_agent,
+        task=CURATE_TASK,
+        context=f"Main topic: {main_topic}",
+        payload=truncate_to_tokens(understanding, budget - budget // 4),
+        baseline=f"Here is the main topic:\n{subject}\nHere is the understanding of the topic:\n"
+        + "\n".join(f"{topic}: {score:.1f}%" for topic, score in scores.items()),
+    )
+    result = await Runner.run(curated_topic_outline_agent, prompt.text)
+    return result.final_output
+
+
+async def write_topic_content(topic: Topic) -> ContentMain:
+    prompt = build_prompt(
+        content_writer_agent,
+        task=CONTENT_TASK,
+        # The writer needs every subtopic title or the plan loses sections; only descriptions are trimmed
+        payload=compact_topics([topic], agent_budget(content_writer_agent.name), numbered=False, keep_subtopics=True),
+        baseline=(
+            f"Write content for the following topic:\nTopic: {topic.topic}\nDescription: {topic.description}\n"
+            f"Subtopics: {', '.join(topic.subtopics)}\nYou need to output the main content, its description "
+            "and the subtopics with the content for each subtopic."
+        ),
+    )
+    result = await Runner.run(content_writer_agent, prompt.text)
+
+    # Expecting the agent to return a list containing ONE ContentMain object for the single topic
+    if not result.final_output.topic or len(result.final_output.topic) != 1:
+        raise PipelineError(f"Agent did not return exactly one ContentMain object for topic: {topic.topic}")
+    return result.final_output.topic[0]
+
+
+def curated_content_stages(guard: Guard) -> List[Stage]:
+    """subject + scores -> curated topics -> content for every topic (one parallel node per topic)."""
+    return [
+        Stage(
+            name="curate",
+            fn=lambda subject, scores: guard(curate_topics, subject, scores),
+            inputs=["subject", "scores"],
+            output="curated",
+            output_type=ListOfTopics,
+        ),
+        Stage(
+            name="content",
+            fn=lambda topic: guard(write_topic_content, topic),
+            inputs=["curated"],
+            output="content",
+            output_type=ContentMain,
+            fan_out=lambda curated: curated.list_of_topics,
+        ),
+    ]
+
+
+def full_pipeline_stages(guard: Guard, scores_fn: Callable[[Any, ListOfTopics, ListOfQuizQuestions], Dict[str, float]]) -> List[Stage]:
+    """subject + profile -> topics -> quiz -> scores -> curated topics -> content per topic."""
+    return [
+        Stage(
+            name="topics",
+            fn=lambda subject: guard(generate_topics, subject),
+            inputs=["subject"],
+            output="topics",
+            output_type=ListOfTopics,
+        ),
+        Stage(
+            name="quiz",
+            # Banked questions are scoped by subject, so generic titles ("Overview") of different courses don't mix
+            fn=lambda subject, topics: (
+                assemble_quiz(topics, guard, " ".join(subject.casefold().split()))
+                if settings.QUESTION_BANK_ENABLED else guard(generate_quiz, topics)
+            ),
+            inputs=["subject", "topics"],
+            output="quiz",
+            output_type=ListOfQuizQuestions,
+        ),
+        # Cheap and deterministic, not worth a checkpoint
+        Stage(
+            name="scores",
+            fn=scores_fn,
+            inputs=["profile", "topics", "quiz"],
+            output="scores",
+            checkpoint=False,
+        ),
+    ] + curated_content_stages(guard)
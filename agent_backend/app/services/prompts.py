@@ -0,0 +1,275 @@
+# agent_backend/app/services/prompts.py
+
+# Prompt building for the agent calls.
+#
+# Every prompt is laid out as: static task text, then context shared by many calls
+# (e.g. the course subject), then the per-request payload. Together with the agent
+# instructions (sent first as the system prompt) this gives consecutive calls to the
+# same agent the longest possible identical prefix, which is what provider-side
+# prompt caching matches on. Topic lists are deduplicated and trimmed to a per-agent
+# token budget, and every call records how many tokens it sent and saved.
+
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from ..core.config import settings
+from ..schemas import Topic
+
+try:
+    import tiktoken
+except ImportError: # tiktoken is optional, token counts are estimated without it
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+
+# --- Token counting ---
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e: # The encoding file is downloaded on first use
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Roughly 4 characters per token for English, but at least one per word or symbol
+    return max(len(text) // 4, len(re.findall(r"\w+|[^\w\s]", text)) * 3 // 4, 1)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    if count_tokens(text) <= budget:
+        return text
+    encoding = _encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:budget])
+    cut = len(text)
+    while cut > 0 and count_tokens(text[:cut]) > budget:
+        cut = cut * 9 // 10
+    return text[:cut]
+
+
+# --- Topic list compaction ---
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _key(text: str) -> str:
+    return _clean(text).casefold().rstrip(".:;")
+
+
+def _first_sentence(text: str) -> str:
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    return match.group(1) if match else text
+
+
+def _dedupe_sentences(text: str) -> str:
+    seen = set()
+    sentences = []
+    for sentence in re.split(r"(?<=[.!?])\s+", _clean(text)):
+        key = _key(sentence)
+        if key and key not in seen:
+            seen.add(key)
+            sentences.append(sentence)
+    return " ".join(sentences)
+
+
+def dedupe_topics(topics: Iterable[Topic]) -> List[Topic]:
+    """
+    Merges topics with the same title and drops repeated text within each topic:
+    subtopics that repeat the topic's title or one of its earlier subtopics, repeated
+    sentences in descriptions and descriptions that only repeat the title. Subtopics
+    of different topics are never merged, even when their titles match.
+    """
+    merged: Dict[str, Topic] = {}
+    for topic in topics:
+        key = _key(topic.topic)
+        if key in merged:
+            merged[key].subtopics.extend(topic.subtopics)
+        else:
+            merged[key] = Topic(
+                topic=topic.topic.strip(),
+                description=_dedupe_sentences(topic.description) if _key(topic.description) != key else "",
+                subtopics=list(topic.subtopics),
+            )
+
+    for key, topic in merged.items():
+        seen = {key}
+        subtopics = []
+        for subtopic in topic.subtopics:
+            key = _key(subtopic)
+            if key and key not in seen:
+                seen.add(key)
+                subtopics.append(_clean(subtopic))
+        topic.subtopics = subtopics
+    return list(merged.values())
+
+
+def _render_topics(topics: List[Topic], description: str, max_subtopics: Optional[int], numbered: bool) -> str:
+    lines = []
+    for i, topic in enumerate(topics):
+        lines.append(f"{i+1}. {topic.topic}" if numbered else f"Topic: {topic.topic}")
+        text = topic.description if description == "full" else _first_sentence(topic.description) if description == "first" else ""
+        if text:
+            lines.append(f"   {text}")
+        subtopics = topic.subtopics if max_subtopics is None else topic.subtopics[:max_subtopics]
+        if subtopics:
+            lines.append(f"   Subtopics: {'; '.join(subtopics)}")
+    return "\n".join(lines)
+
+
+# From most to least detailed; titles are always kept, subtopics as long as possible
+_TOPIC_DETAIL_LEVELS = [
+    ("full", None),
+    ("first", None),
+    ("", None),
+    ("first", 3),
+    ("", 3),
+    ("", 1),
+    ("", 0),
+]
+
+
+def _report_trim(topics: List[Topic], description: str, max_subtopics: Optional[int], budget: int):
+    trimmed = {}
+    if description == "first":
+        trimmed["descriptions_shortened"] = sum(1 for t in topics if _first_sentence(t.description) != t.description)
+    elif description == "":
+        trimmed["descriptions_dropped"] = sum(1 for t in topics if t.description)
+    if max_subtopics is not None:
+        trimmed["subtopics_dropped"] = sum(max(0, len(t.subtopics) - max_subtopics) for t in topics)
+    trimmed = {kind: count for kind, count in trimmed.items() if count}
+    if trimmed:
+        logger.warning(
+            f"Topic list trimmed to fit {budget} tokens: "
+            + ", ".join(f"{count} {kind.replace('_', ' ')}" for kind, count in trimmed.items())
+        )
+        prompt_stats.record_trim(trimmed)
+
+
+def compact_topics(topics: Iterable[Topic], budget: int, numbered: bool = True, keep_subtopics: bool = False) -> str:
+    """
+    Deduplicated topic list ("1. Title" or "Topic: Title"), with as much detail as fits in
+    `budget` tokens. With `keep_subtopics` only descriptions are trimmed; every subtopic
+    is kept even if the list then exceeds the budget. Anything trimmed is logged and
+    counted in /prompt-stats.
+    """
+    deduped = dedupe_topics(topics)
+    levels = [level for level in _TOPIC_DETAIL_LEVELS if level[1] is None] if keep_subtopics else _TOPIC_DETAIL_LEVELS
+    for description, max_subtopics in levels:
+        text = _render_topics(deduped, description, max_subtopics, numbered)
+        if count_tokens(text) <= budget:
+            break
+    else:
+        logger.warning(f"Topic list is {count_tokens(text)} tokens even at its shortest, over the prompt budget of {budget}")
+    _report_trim(deduped, description, max_subtopics, budget)
+    return text
+
+
+# --- Prompt assembly and accounting ---
+
+@dataclass
+class BuiltPrompt:
+    agent_name: str
+    text: str
+    tokens: int # Instructions plus prompt, i.e. what the call sends
+    prefix_tokens: int # Instructions plus task text, identical across calls to this agent
+    baseline_tokens: int # What the call would have sent without compaction
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.baseline_tokens - self.tokens)
+
+
+def _instructions_tokens(agent) -> int:
+    instructions = getattr(agent, "instructions", None)
+    return count_tokens(instructions) if isinstance(instructions, str) else 0
+
+
+def agent_budget(agent_name: str) -> int:
+    return settings.PROMPT_TOKEN_BUDGETS.get(agent_name, settings.PROMPT_TOKEN_BUDGETS.get("default", 2000))
+
+
+def build_prompt(agent, task: str, payload: str, context: str = "", baseline: Optional[str] = None) -> BuiltPrompt:
+    """
+    `task` must not vary between calls, `context` should vary rarely and `payload` holds
+    the per-request data. `baseline` is the uncompacted prompt, for the savings report.
+    """
+    text = "\n\n".join(part for part in (task, context, payload) if part)
+    instructions = _instructions_tokens(agent)
+    built = BuiltPrompt(
+        agent_name=agent.name,
+        text=text,
+        tokens=instructions + count_tokens(text),
+        prefix_tokens=instructions + count_tokens(task),
+        baseline_tokens=instructions + count_tokens(baseline if baseline is not None else text),
+    )
+    prompt_stats.record(built)
+    logger.info(
+        f"Prompt for {built.agent_name}: {built.tokens} tokens "
+        f"({built.prefix_tokens} stable prefix, {built.saved_tokens} saved)"
+    )
+    return built
+
+
+class PromptStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents: Dict[str, Dict[str, int]] = {}
+        self._trimmed: Dict[str, int] = {}
+
+    def record(self, built: BuiltPrompt):
+        with self._lock:
+            agent = self._agents.setdefault(built.agent_name, {"calls": 0, "tokens": 0, "saved_tokens": 0, "prefix_tokens": 0})
+            agent["calls"] += 1
+            agent["tokens"] += built.tokens
+            # Summed per call, so a prompt that grew doesn't cancel out another one's savings
+            agent["saved_tokens"] += built.saved_tokens
+            agent["prefix_tokens"] = built.prefix_tokens
+
+    def record_trim(self, trimmed: Dict[str, int]):
+        with self._lock:
+            for kind, count in trimmed.items():
+                self._trimmed[kind] = self._trimmed.get(kind, 0) + count
+
+    def stats(self) -> dict:
+        with self._lock:
+            trimmed = dict(self._trimmed)
+            agents = {
+                name: {
+                    "calls": agent["calls"],
+                    "budget": agent_budget(name),
+                    "tokens_per_call": round(agent["tokens"] / agent["calls"], 1),
+                    "stable_prefix_tokens": agent["prefix_tokens"],
+                    "tokens_sent": agent["tokens"],
+                    "tokens_saved": agent["saved_tokens"],
+                }
+                for name, agent in self._agents.items()
+            }
+        sent = sum(a["tokens_sent"] for a in agents.values())
+        saved = sum(a["tokens_saved"] for a in agents.values())
+        return {
+            "token_counter": "tiktoken" if _encoding() is not None else "estimate",
+            "tokens_sent": sent,
+            "tokens_saved": saved,
+            "saved_pct": round(100 * saved / (sent + saved), 1) if sent + saved else 0.0,
+            "trimmed": trimmed, # Topic detail dropped to fit budgets
+            "agents": agents,
+        }
+
+
+prompt_stats = PromptStats()
@@ -0,0 +1,210 @@
+# agent_backend/app/services/question_bank.py
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from ..core.config import settings
+from ..core.shared_state import SharedState, shared_state
+from ..schemas import QuizQuestions
+from .subject_cache import normalize_subject
+
+logger = logging.getLogger(__name__)
+
+CHOICES = ("a", "b", "c", "d")
+
+
+def topic_key(scope: Optional[str], topic: str) -> str:
+    """Bank key: the scope (uploaded material set, or the subject) plus the topic's normalized content words."""
+    words = normalize_subject(topic) or [" ".join(topic.casefold().split())]
+    return f"{scope or '-'}|{' '.join(words)}"
+
+
+def _question_key(question: QuizQuestions) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", question.quiz_question.casefold()).strip()
+
+
+def validate_question(question: QuizQuestions, topic: str) -> Optional[QuizQuestions]:
+    """Returns the question filed under `topic` with a normalized answer letter, or None if it is unusable."""
+    answer = question.correct_answer.strip().lower().rstrip(").:")
+    if answer not in CHOICES:
+        return None
+    if not question.quiz_question.strip() or not all(
+        getattr(question, f"choice_{choice}").strip() for choice in CHOICES
+    ):
+        return None
+    return question.model_copy(update={"topic": topic, "correct_answer": answer})
+
+
+class QuestionBank:
+    """
+    Validated quiz questions per topic, reused across quizzes.
+
+    Questions are handed out round-robin within a topic, so consecutive quizzes over the
+    same topics vary while the bank has more questions than a quiz needs. Topics are
+    evicted least-recently-used beyond `max_topics`.
+    """
+
+    def __init__(self, max_per_topic: int, max_topics: int):
+        self.max_per_topic = max_per_topic
+        self.max_topics = max_topics
+        self._topics: "OrderedDict[str, List[QuizQuestions]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.served_from_bank = 0
+        self.generated = 0
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._topics.get(key, ()))
+
+    def add(self, key: str, questions: List[QuizQuestions]) -> int:
+        """Adds questions that aren't banked yet; returns how many were added."""
+        with self._lock:
+            banked = self._topics.setdefault(key, [])
+            self._topics.move_to_end(key)
+            seen = {_question_key(q) for q in banked}
+            added = 0
+            for question in questions:
+                question_key = _question_key(question)
+                if question_key in seen or len(banked) >= self.max_per_topic:
+                    continue
+                seen.add(question_key)
+                banked.append(question)
+                added += 1
+            self.generated += added
+            while len(self._topics) > self.max_topics:
+                self._topics.popitem(last=False)
+            return added
+
+    def take(self, key: str, count: int) -> List[QuizQuestions]:
+        """Up to `count` banked questions, least recently served first."""
+        with self._lock:
+            banked = self._topics.get(key)
+            if not banked:
+                return []
+            self._topics.move_to_end(key)
+            taken = banked[:count]
+            # Rotate so the next quiz starts with questions this one didn't use
+            banked[:] = banked[count:] + taken
+            self.served_from_bank += len(taken)
+            return taken
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "topics": len(self._topics),
+                "questions": sum(len(q) for q in self._topics.values()),
+                "questions_generated": self.generated,
+                "questions_served": self.served_from_bank,
+            }
+
+
+class SQLiteQuestionBank(QuestionBank):
+    """QuestionBank in the shared SQLite database, so all worker processes fill and draw from one bank."""
+
+    def __init__(self, state: SharedState, max_per_topic: int, max_topics: int):
+        super().__init__(max_per_topic, max_topics)
+        self.state = state
+        state.add_schema(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_questions (
+                topic_key TEXT NOT NULL,
+                question_key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                served_seq INTEGER NOT NULL DEFAULT 0,
+                used_at REAL NOT NULL,
+                PRIMARY KEY (topic_key, question_key)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS quiz_questions_used_at ON quiz_questions (used_at)",
+            "CREATE TABLE IF NOT EXISTS quiz_question_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+        )
+
+    @staticmethod
+    def _increment(conn, name: str, by: int):
+        conn.execute(
+            "INSERT INTO quiz_question_counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, by),
+        )
+
+    def count(self, key: str) -> int:
+        with self.state.locked() as conn:
+            return conn.execute("SELECT COUNT(*) FROM quiz_questions WHERE topic_key = ?", (key,)).fetchone()[0]
+
+    def add(self, key: str, questions: List[QuizQuestions]) -> int:
+        now = time.time()
+        with self.state.transaction() as conn:
+            room = self.max_per_topic - conn.execute(
+                "SELECT COUNT(*) FROM quiz_questions WHERE topic_key = ?", (key,)
+            ).fetchone()[0]
+            added = 0
+            for question in questions:
+                if added >= room:
+                    break
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO quiz_questions (topic_key, question_key, question, used_at) VALUES (?, ?, ?, ?)",
+                    (key, _question_key(question), question.model_dump_json(), now),
+                )
+                added += cursor.rowcount
+            conn.execute("UPDATE quiz_questions SET used_at = ? WHERE topic_key = ?", (now, key))
+            self._increment(conn, "generated", added)
+            conn.execute(
+                """
+                DELETE FROM quiz_questions WHERE topic_key IN (
+                    SELECT topic_key FROM quiz_questions GROUP BY topic_key
+                    ORDER BY MAX(used_at) DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_topics,),
+            )
+            return added
+
+    def take(self, key: str, count: int) -> List[QuizQuestions]:
+        if count <= 0:
+            return []
+        with self.state.transaction() as conn:
+            rows = conn.execute(
+                "SELECT question_key, question FROM quiz_questions WHERE topic_key = ? ORDER BY served_seq, rowid LIMIT ?",
+                (key, count),
+            ).fetchall()
+            if rows:
+                # Move the served questions behind the rest, as in the in-memory rotation
+                next_seq = conn.execute(
+                    "SELECT MAX(served_seq) FROM quiz_questions WHERE topic_key = ?", (key,)
+                ).fetchone()[0] + 1
+                conn.executemany(
+                    "UPDATE quiz_questions SET served_seq = ?, used_at = ? WHERE topic_key = ? AND question_key = ?",
+                    [(next_seq, time.time(), key, row[0]) for row in rows],
+                )
+                self._increment(conn, "served", len(rows))
+        return [QuizQuestions.model_validate_json(row[1]) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self.state.locked() as conn:
+            topics, questions = conn.execute(
+                "SELECT COUNT(DISTINCT topic_key), COUNT(*) FROM quiz_questions"
+            ).fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM quiz_question_counters").fetchall())
+        return {
+            "topics": topics,
+            "questions": questions,
+            "questions_generated": counters.get("generated", 0),
+            "questions_served": counters.get("served", 0),
+        }
+
+
+if shared_state is not None:
+    question_bank = SQLiteQuestionBank(
+        shared_state,
+        max_per_topic=settings.QUESTION_BANK_MAX_PER_TOPIC,
+        max_topics=settings.QUESTION_BANK_MAX_TOPICS,
+    )
+else:
+    question_bank = QuestionBank(
+        max_per_topic=settings.QUESTION_BANK_MAX_PER_TOPIC,
+        max_topics=settings.QUESTION_BANK_MAX_TOPICS,
+    )
@@ -0,0 +1,199 @@
+# agent_backend/app/services/study_plan_store.py
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from ..core.config import settings
+
+try:
+    import zstandard
+except ImportError: # zstandard is optional, gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+# Temp dirs older than this are left over from a crashed save
+STALE_TMP_SECONDS = 60 * 60
+
+
+class StudyPlanTooLarge(ValueError):
+    pass
+
+
+class StudyPlanManifest(BaseModel):
+    plan_id: str
+    title: str
+    codec: str
+    topic_titles: List[str]
+    created_at: float
+
+    @property
+    def topic_count(self) -> int:
+        return len(self.topic_titles)
+
+
+def _resolve_codec(preferred: str) -> str:
+    if preferred == "zstd" and zstandard is None:
+        raise RuntimeError("STUDY_PLAN_COMPRESSION is 'zstd' but the zstandard package is not installed.")
+    if preferred == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if preferred not in ("zstd", "gzip"):
+        raise RuntimeError(f"Unknown STUDY_PLAN_COMPRESSION codec: {preferred}")
+    return preferred
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Study plan was stored with zstd but the zstandard package is not installed.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _canonical_json(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def plan_content_hash(title: str, topics: list) -> str:
+    """Content address of a plan: identical plans always map to the same id."""
+    return hashlib.sha256(_canonical_json({"title": title, "topic": topics})).hexdigest()[:32]
+
+
+class StudyPlanStore:
+    """
+    Stores generated study plans on disk, compressed and addressed by content hash.
+
+    Each plan is a directory holding a small uncompressed manifest plus one compressed
+    blob per topic, so a single topic can be served without decompressing the whole plan.
+    Plans larger than `max_plan_bytes` (uncompressed JSON) are rejected, and the oldest
+    plans are deleted once the store holds more than `max_total_bytes` on disk.
+    """
+
+    def __init__(self, root_dir: str, codec: str = "auto", max_plan_bytes: Optional[int] = None, max_total_bytes: Optional[int] = None):
+        self.root_dir = root_dir
+        self.codec = _resolve_codec(codec)
+        self.max_plan_bytes = max_plan_bytes
+        self.max_total_bytes = max_total_bytes
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def _plan_dir(self, plan_id: str) -> str:
+        if not plan_id.isalnum():
+            raise ValueError(f"Invalid study plan id: {plan_id}")
+        return os.path.join(self.root_dir, plan_id)
+
+    def save(self, title: str, topics: list) -> StudyPlanManifest:
+        """Saves `topics` (a list of ContentMain dicts). Saving an existing plan is a no-op."""
+        plan_id = plan_content_hash(title, topics)
+        existing = self.get_manifest(plan_id)
+        if existing is not None:
+            return existing
+
+        raw_topics = [_canonical_json(topic) for topic in topics]
+        raw_size = sum(len(raw) for raw in raw_topics)
+        if self.max_plan_bytes is not None and raw_size > self.max_plan_bytes:
+            raise StudyPlanTooLarge(f"Study plan is {raw_size} bytes, the limit is {self.max_plan_bytes}.")
+
+        manifest = StudyPlanManifest(
+            plan_id=plan_id,
+            title=title,
+            codec=self.codec,
+            topic_titles=[topic.get("topic_title", "") for topic in topics],
+            created_at=time.time(),
+        )
+        # Write into a temp dir and rename it into place so readers never see a partial plan
+        tmp_dir = tempfile.mkdtemp(prefix=f".{plan_id}-", dir=self.root_dir)
+        try:
+            stored_size = 0
+            for index, raw in enumerate(raw_topics):
+                blob = _compress(self.codec, raw)
+                stored_size += len(blob)
+                with open(os.path.join(tmp_dir, f"topic-{index}"), "wb") as f:
+                    f.write(blob)
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                f.write(manifest.model_dump_json())
+            os.replace(tmp_dir, self._plan_dir(plan_id))
+        except OSError:
+            # Another request saved the same plan concurrently
+            existing = self.get_manifest(plan_id)
+            if existing is not None:
+                return existing
+            raise
+        finally:
+            # Nothing left to remove once the rename succeeded
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        logger.info(f"Stored study plan {plan_id} ({len(topics)} topics, {raw_size} bytes -> {stored_size} bytes {self.codec})")
+        self._evict(keep=plan_id)
+        return manifest
+
+    def _evict(self, keep: str):
+        """Deletes the oldest plans beyond `max_total_bytes`, and temp dirs of crashed saves."""
+        now = time.time()
+        plans = []
+        total = 0
+        for entry in os.scandir(self.root_dir):
+            if not entry.is_dir():
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+                if entry.name.startswith("."):
+                    if mtime < now - STALE_TMP_SECONDS:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+            except FileNotFoundError: # Evicted by another worker meanwhile
+                continue
+            plans.append((mtime, entry.name, size))
+            total += size
+        if self.max_total_bytes is None:
+            return
+        for _, plan_id, size in sorted(plans):
+            if total <= self.max_total_bytes:
+                break
+            if plan_id == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root_dir, plan_id), ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted study plan {plan_id} ({size} bytes)")
+
+    def get_manifest(self, plan_id: str) -> Optional[StudyPlanManifest]:
+        try:
+            with open(os.path.join(self._plan_dir(plan_id), MANIFEST_FILE), "r", encoding="utf-8") as f:
+                return StudyPlanManifest.model_validate_json(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read_topic(self, manifest: StudyPlanManifest, index: int) -> bytes:
+        """Returns the JSON bytes of a single ContentMain."""
+        with open(os.path.join(self._plan_dir(manifest.plan_id), f"topic-{index}"), "rb") as f:
+            return _decompress(manifest.codec, f.read())
+
+    def read_plan(self, manifest: StudyPlanManifest) -> bytes:
+        """Returns the JSON bytes of the whole plan, shaped like ContentResponse plus plan_id and title."""
+        topics = [self.read_topic(manifest, index) for index in range(manifest.topic_count)]
+        header = json.dumps({"plan_id": manifest.plan_id, "title": manifest.title}, ensure_ascii=False)
+        return header[:-1].encode("utf-8") + b',"topic":[' + b",".join(topics) + b"]}"
+
+
+study_plan_store = StudyPlanStore(
+    settings.STUDY_PLAN_STORE_DIR,
+    settings.STUDY_PLAN_COMPRESSION,
+    max_plan_bytes=settings.STUDY_PLAN_MAX_BYTES,
+    max_total_bytes=settings.STUDY_PLAN_STORE_MAX_BYTES,
+)
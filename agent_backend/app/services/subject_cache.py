@@ -0,0 +1,324 @@
+# agent_backend/app/services/subject_cache.py
+
+import hashlib
+import itertools
+import json
+import logging
+import random
+import re
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from .. import schemas
+from ..core.config import settings
+from ..core.shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Words that don't change which course a subject refers to
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "to", "in", "for", "on", "with", "&",
+    "intro", "introduction", "introductory", "basics", "basic", "fundamentals",
+    "course", "unit", "subject", "class", "lecture", "lectures", "notes",
+}
+# Course codes such as MATH1051 or CS101A; the material set already identifies the course
+COURSE_CODE = re.compile(r"^[a-z]{2,5}\d{3,5}[a-z]?$")
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_subject(text: str) -> list[str]:
+    """Lowercased, accent-free, sorted unique content words of a subject string."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    tokens = re.split(r"[^a-z0-9]+", text)
+    return sorted({t for t in tokens if t and t not in STOPWORDS and not COURSE_CODE.match(t)})
+
+
+def shingles(tokens: list[str], k: int = 3) -> set[str]:
+    """Character k-grams of each token (with word boundaries), so word order doesn't matter."""
+    result = set()
+    for token in tokens:
+        padded = f"#{token}#"
+        if len(padded) <= k:
+            result.add(padded)
+        else:
+            result.update(padded[i:i + k] for i in range(len(padded) - k + 1))
+    return result
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, items: set[str]) -> tuple:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "little")
+            for item in items
+        ]
+        return tuple(
+            min((a * h + b) % MERSENNE_PRIME for h in hashes)
+            for a, b in self._perms
+        )
+
+
+class SimilarityHit(BaseModel):
+    value: Any
+    similarity: float
+    matched_subject: str
+
+
+class _Entry:
+    __slots__ = ("namespace", "subject", "shingles", "bands", "value")
+
+    def __init__(self, namespace, subject, shingles, bands, value):
+        self.namespace = namespace
+        self.subject = subject
+        self.shingles = shingles
+        self.bands = bands
+        self.value = value
+
+
+class SubjectSimilarityIndex:
+    """
+    Near-duplicate cache of agent outputs keyed by free-text subject.
+
+    Subjects are normalized and shingled, MinHash signatures are split into LSH bands
+    to find candidates, and a candidate is reused when its Jaccard similarity to the
+    query is at least `threshold`. Entries are namespaced (agent + material set) and
+    evicted least-recently-used beyond `max_entries`.
+    """
+
+    def __init__(self, threshold: float, num_perm: int = 64, bands: int = 16, max_entries: int = 2048, recent_hits: int = 200):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self._hasher = MinHasher(num_perm)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: dict[tuple, set[int]] = {}
+        self._ids = itertools.count()
+        self.lookups = 0
+        self.hits = 0
+        self.recent_hits: deque = deque(maxlen=recent_hits)
+        self.recent_misses: deque = deque(maxlen=recent_hits)
+
+    def _band_keys(self, namespace: str, signature: tuple) -> list[tuple]:
+        return [
+            (namespace, band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def lookup(self, namespace: str, subject: str) -> Optional[SimilarityHit]:
+        tokens = normalize_subject(subject)
+        if not tokens:
+            return None
+        self.lookups += 1
+        query = shingles(tokens)
+        band_keys = self._band_keys(namespace, self._hasher.signature(query))
+
+        candidates = self._candidates(band_keys)
+
+        best_id, best_similarity = None, 0.0
+        for entry_id, entry in candidates.items():
+            similarity = jaccard(query, entry.shingles)
+            if similarity > best_similarity:
+                best_id, best_similarity = entry_id, similarity
+
+        if best_id is None or best_similarity < self.threshold:
+            # Near misses show how far the threshold is from catching them
+            self.recent_misses.append({
+                "namespace": namespace,
+                "subject": subject,
+                "best_similarity": round(best_similarity, 3),
+                "best_match": candidates[best_id].subject if best_id is not None else None,
+                "at": time.time(),
+            })
+            return None
+
+        entry = candidates[best_id]
+        self._touch(best_id)
+        self.hits += 1
+        self.recent_hits.append({
+            "namespace": namespace,
+            "subject": subject,
+            "matched_subject": entry.subject,
+            "similarity": round(best_similarity, 3),
+            "at": time.time(),
+        })
+        logger.info(f"Subject cache hit ({namespace}): '{subject}' ~ '{entry.subject}' similarity={best_similarity:.3f}")
+        return SimilarityHit(value=entry.value, similarity=best_similarity, matched_subject=entry.subject)
+
+    def add(self, namespace: str, subject: str, value: Any):
+        tokens = normalize_subject(subject)
+        if not tokens:
+            return
+        entry_shingles = shingles(tokens)
+        band_keys = self._band_keys(namespace, self._hasher.signature(entry_shingles))
+        self._store(_Entry(namespace, subject, entry_shingles, band_keys, value))
+
+    # --- Storage; SQLiteSubjectSimilarityIndex keeps the same data in the shared database ---
+
+    def _candidates(self, band_keys: list[tuple]) -> dict:
+        entry_ids = set()
+        for key in band_keys:
+            entry_ids.update(self._buckets.get(key, ()))
+        return {entry_id: self._entries[entry_id] for entry_id in entry_ids}
+
+    def _touch(self, entry_id):
+        self._entries.move_to_end(entry_id)
+
+    def _store(self, entry: _Entry):
+        entry_id = next(self._ids)
+        self._entries[entry_id] = entry
+        for key in entry.bands:
+            self._buckets.setdefault(key, set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            evicted_id, evicted = self._entries.popitem(last=False)
+            for key in evicted.bands:
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(evicted_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def _entry_count(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "entries": self._entry_count(),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "recent_hits": list(self.recent_hits),
+            "recent_misses": list(self.recent_misses),
+        }
+
+
+class SQLiteSubjectSimilarityIndex(SubjectSimilarityIndex):
+    """
+    SubjectSimilarityIndex with its entries and LSH buckets in the shared SQLite database,
+    so every worker sees results cached by the others. Hit and miss counters stay per process.
+    """
+
+    def __init__(self, state: SharedState, threshold: float, **kwargs):
+        super().__init__(threshold, **kwargs)
+        self.state = state
+        state.add_schema(
+            """
+            CREATE TABLE IF NOT EXISTS subject_cache_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                shingles TEXT NOT NULL,
+                value_type TEXT,
+                value TEXT NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS subject_cache_entries_used_at ON subject_cache_entries (used_at)",
+            """
+            CREATE TABLE IF NOT EXISTS subject_cache_bands (
+                band TEXT NOT NULL,
+                entry_id INTEGER NOT NULL,
+                PRIMARY KEY (band, entry_id)
+            ) WITHOUT ROWID
+            """,
+            "CREATE INDEX IF NOT EXISTS subject_cache_bands_entry ON subject_cache_bands (entry_id)",
+        )
+
+    @staticmethod
+    def _band_id(key: tuple) -> str:
+        namespace, band, rows = key
+        return hashlib.blake2b(f"{namespace}|{band}|{rows}".encode("utf-8"), digest_size=12).hexdigest()
+
+    @staticmethod
+    def _encode_value(value: Any) -> tuple:
+        if isinstance(value, BaseModel):
+            return type(value).__name__, value.model_dump_json()
+        return None, json.dumps(value)
+
+    @staticmethod
+    def _decode_value(value_type: Optional[str], data: str) -> Any:
+        model = getattr(schemas, value_type, None) if value_type else None
+        if isinstance(model, type) and issubclass(model, BaseModel):
+            return model.model_validate_json(data)
+        return json.loads(data)
+
+    def _candidates(self, band_keys: list[tuple]) -> dict:
+        band_ids = [self._band_id(key) for key in band_keys]
+        with self.state.locked() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT id, namespace, subject, shingles, value_type, value FROM subject_cache_entries
+                WHERE id IN (SELECT entry_id FROM subject_cache_bands WHERE band IN ({",".join("?" * len(band_ids))}))
+                """,
+                band_ids,
+            ).fetchall()
+        return {
+            row[0]: _Entry(row[1], row[2], set(json.loads(row[3])), None, self._decode_value(row[4], row[5]))
+            for row in rows
+        }
+
+    def _touch(self, entry_id):
+        with self.state.locked() as conn:
+            conn.execute("UPDATE subject_cache_entries SET used_at = ? WHERE id = ?", (time.time(), entry_id))
+
+    def _store(self, entry: _Entry):
+        value_type, value = self._encode_value(entry.value)
+        with self.state.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO subject_cache_entries (namespace, subject, shingles, value_type, value, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (entry.namespace, entry.subject, json.dumps(sorted(entry.shingles)), value_type, value, time.time()),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO subject_cache_bands (band, entry_id) VALUES (?, ?)",
+                [(self._band_id(key), cursor.lastrowid) for key in entry.bands],
+            )
+            evicted = [row[0] for row in conn.execute(
+                "SELECT id FROM subject_cache_entries ORDER BY used_at DESC LIMIT -1 OFFSET ?", (self.max_entries,)
+            )]
+            if evicted:
+                marks = ",".join("?" * len(evicted))
+                conn.execute(f"DELETE FROM subject_cache_bands WHERE entry_id IN ({marks})", evicted)
+                conn.execute(f"DELETE FROM subject_cache_entries WHERE id IN ({marks})", evicted)
+
+    def _entry_count(self) -> int:
+        with self.state.locked() as conn:
+            return conn.execute("SELECT COUNT(*) FROM subject_cache_entries").fetchone()[0]
+
+
+def cache_namespace(agent_name: str, material_set_id: Optional[str]) -> str:
+    return f"{agent_name}:{material_set_id or '-'}"
+
+
+if shared_state is not None:
+    subject_cache = SQLiteSubjectSimilarityIndex(
+        shared_state,
+        threshold=settings.SUBJECT_CACHE_SIMILARITY_THRESHOLD,
+        max_entries=settings.SUBJECT_CACHE_MAX_ENTRIES,
+    )
+else:
+    subject_cache = SubjectSimilarityIndex(
+        threshold=settings.SUBJECT_CACHE_SIMILARITY_THRESHOLD,
+        max_entries=settings.SUBJECT_CACHE_MAX_ENTRIES,
+    )
@@ -0,0 +1,117 @@
+# agent_backend/benchmarks/bench_serialization.py
+"""
+Micro-benchmark of the response path for /generate-single-topic.
+
+  legacy: copy agent output field by field into parallel API models, then let
+          FastAPI validate it against response_model and encode it with json.dumps
+  fast:   return the validated agent output and serialize it with pydantic-core
+
+Also reports response bytes before and after gzip/brotli compression.
+
+Run from agent_backend/:  python -m benchmarks.bench_serialization
+"""
+
+import argparse
+import json
+import random
+import timeit
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.compression import brotli, compress_body
+from app.core.responses import dump_json
+from app.schemas import ContentMain, ContentSub
+
+
+# The duplicated API models that generation.py used to define
+class LegacyContentSub(BaseModel):
+    sub_topic_title: str
+    sub_content_text: str
+
+class LegacyContentMain(BaseModel):
+    topic_title: str
+    main_description: str
+    subtopics: List[LegacyContentSub]
+
+
+WORDS = (
+    "matrix vector eigenvalue basis span linear transformation determinant rank "
+    "kernel image orthogonal projection subspace dimension inner product norm"
+).split()
+
+
+def make_content(subtopics: int, words_per_subtopic: int) -> ContentMain:
+    rng = random.Random(0)
+    return ContentMain(
+        topic_title="Linear Transformations",
+        main_description=" ".join(rng.choice(WORDS) for _ in range(120)),
+        subtopics=[
+            ContentSub(
+                sub_topic_title=f"Subtopic {i + 1}",
+                sub_content_text=" ".join(rng.choice(WORDS) for _ in range(words_per_subtopic)),
+            )
+            for i in range(subtopics)
+        ],
+    )
+
+
+legacy_adapter = TypeAdapter(LegacyContentMain)
+
+
+def legacy_path(agent_output: ContentMain) -> bytes:
+    response_main = LegacyContentMain(
+        topic_title=agent_output.topic_title,
+        main_description=agent_output.main_description,
+        subtopics=[
+            LegacyContentSub(sub_topic_title=sub.sub_topic_title, sub_content_text=sub.sub_content_text)
+            for sub in agent_output.subtopics
+        ],
+    )
+    # What FastAPI does with a response_model: validate, dump, encode
+    validated = legacy_adapter.validate_python(response_main.model_dump())
+    content = jsonable_encoder(validated)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(agent_output: ContentMain) -> bytes:
+    return dump_json(agent_output)
+
+
+def per_call_us(fn, arg, number: int) -> float:
+    best = min(timeit.repeat(lambda: fn(arg), number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subtopics", type=int, default=3)
+    parser.add_argument("--words", type=int, default=1500, help="words per subtopic")
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    content = make_content(args.subtopics, args.words)
+    legacy_bytes = legacy_path(content)
+    fast_bytes = fast_path(content)
+    assert json.loads(legacy_bytes) == json.loads(fast_bytes)
+
+    legacy_us = per_call_us(legacy_path, content, args.number)
+    fast_us = per_call_us(fast_path, content, args.number)
+    print(f"ContentMain with {args.subtopics} subtopics x {args.words} words")
+    print(f"  legacy serialization: {legacy_us:10.1f} us/response")
+    print(f"  fast serialization:   {fast_us:10.1f} us/response  ({legacy_us / fast_us:.1f}x faster)")
+
+    print(f"  identity:             {len(fast_bytes):10d} bytes")
+    encodings = ["gzip", "br"] if brotli is not None else ["gzip"]
+    for encoding in encodings:
+        compressed = compress_body(encoding, fast_bytes)
+        compress_us = per_call_us(lambda body: compress_body(encoding, body), fast_bytes, max(args.number // 10, 1))
+        print(
+            f"  {encoding + ':':<21} {len(compressed):10d} bytes "
+            f"({100 * len(compressed) / len(fast_bytes):.1f}%, {compress_us:.1f} us to compress)"
+        )
+
+
+if __name__ == "__main__":
+    main()
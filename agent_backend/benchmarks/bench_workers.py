@@ -0,0 +1,160 @@
+# agent_backend/benchmarks/bench_workers.py
+"""
+Throughput of a CPU-bound endpoint with 1..N gunicorn/uvicorn workers.
+
+Starts `gunicorn -c gunicorn.conf.py app.main:app` once per worker count and drives
+POST /generate-pdf-from-text with unique markdown per request, so every request is a
+PDF cache miss rendered in pure Python. A single process is bound by the GIL no matter
+how many threads it has; extra worker processes should scale close to linearly up to
+the number of CPU cores.
+
+No agent calls are made, so dummy OpenAI settings are enough.
+
+Run from agent_backend/:  python -m benchmarks.bench_workers --workers 1,2,4 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+WORDS = (
+    "matrix vector eigenvalue basis span linear transformation determinant rank "
+    "kernel image projection orthogonal inner product norm subspace dimension"
+).split()
+
+
+def make_markdown(sections: int, rng: random.Random) -> str:
+    lines = []
+    for i in range(sections):
+        lines.append(f"## Section {i+1}: {' '.join(rng.choices(WORDS, k=3))}")
+        for _ in range(4):
+            lines.append(" ".join(rng.choices(WORDS, k=80)))
+            lines.append("")
+        lines.extend(f"- {' '.join(rng.choices(WORDS, k=12))}" for _ in range(5))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, state_dir: str, show_logs: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        BIND=f"127.0.0.1:{port}",
+        PDF_CACHE_DIR=os.path.join(state_dir, "pdf_cache"),
+        SHARED_STATE_PATH=os.path.join(state_dir, "shared_state.sqlite3"),
+    )
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    env.setdefault("OPENAI_VECTOR_STORE_ID", "vs_benchmark")
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "app.main:app"],
+        env=env,
+        stdout=None if show_logs else subprocess.DEVNULL,
+        stderr=None if show_logs else subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout:.0f}s")
+
+
+async def drive(base_url: str, concurrency: int, duration: float, sections: int, warmup: float) -> List[float]:
+    """Latencies of the requests completed in `duration` seconds after `warmup`."""
+    latencies: List[float] = []
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop = measure_from + duration
+
+    async def client_loop(client: httpx.AsyncClient, rng: random.Random):
+        while True:
+            began = time.monotonic()
+            if began >= stop:
+                return
+            response = await client.post(
+                "/generate-pdf-from-text",
+                json={"title": f"Bench {rng.random()}", "content": make_markdown(sections, rng)},
+            )
+            response.raise_for_status()
+            finished = time.monotonic()
+            if began >= measure_from and finished <= stop:
+                latencies.append(finished - began)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await asyncio.gather(*(client_loop(client, random.Random(i)) for i in range(concurrency)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--sections", type=int, default=6, help="markdown sections per PDF")
+    parser.add_argument("--clients-per-worker", type=int, default=2)
+    parser.add_argument("--server-logs", action="store_true", help="show the servers' log output")
+    args = parser.parse_args()
+
+    worker_counts = [int(n) for n in args.workers.split(",")]
+    cpus = os.cpu_count() or 1
+    print(f"{cpus} CPUs; {args.sections} sections per PDF, {args.duration:.0f}s per run")
+    if max(worker_counts) > cpus:
+        print(f"Warning: more workers than CPUs, runs above {cpus} workers cannot scale")
+
+    print(f"{'workers':>7}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'speedup':>7}  {'efficiency':>10}")
+    baseline = None
+    for workers in worker_counts:
+        port = free_port()
+        with tempfile.TemporaryDirectory() as state_dir:
+            server = start_server(workers, port, state_dir, args.server_logs)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                asyncio.run(wait_ready(base_url))
+                latencies = asyncio.run(drive(
+                    base_url, workers * args.clients_per_worker, args.duration, args.sections, args.warmup,
+                ))
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+        if not latencies:
+            print(f"{workers:>7}  no requests completed")
+            continue
+        throughput = len(latencies) / args.duration
+        if baseline is None:
+            # Per-worker throughput of the first run, normally the single-worker one
+            baseline = throughput / workers
+        speedup = throughput / baseline
+        p50 = statistics.median(latencies) * 1000
+        p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else p50
+        print(
+            f"{workers:>7}  {throughput:>8.1f}  {p50:>8.1f}  {p95:>8.1f}  "
+            f"{speedup:>6.2f}x  {speedup / workers:>9.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# agent_backend/gunicorn.conf.py
+
+# Multi-worker deployment: gunicorn imports the app once in the master (preload_app)
+# and forks WEB_CONCURRENCY uvicorn workers from it.
+#
+#     gunicorn -c gunicorn.conf.py app.main:app
+
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+# Agent requests spend their time waiting on the OpenAI API, so a few workers are enough;
+# raise WEB_CONCURRENCY for CPU-bound load such as PDF rendering
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Agent runs and long PDF downloads keep a request open for minutes
+timeout = 600
+graceful_timeout = 30
+keepalive = 5
+
+# The app splits AGENT_MAX_CONCURRENT_RUNS and AGENT_MAX_QUEUED_RUNS between the workers
+# by this count, so set the worker count through WEB_CONCURRENCY rather than -w
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Idempotency records, the subject cache, the question bank and rate limits have to be
+# shared once there is more than one worker. Set before the app is preloaded.
+if workers > 1:
+    os.environ.setdefault("SHARED_STATE_PATH", "data/shared_state.sqlite3")
@@ -1,192 +1,250 @@
-import os
-from agents import Agent, Runner,function_tool,trace
-from dotenv import load_dotenv
-import asyncio
-from pydantic import BaseModel
-from openai.types.responses import (
-    ResponseFunctionCallArgumentsDeltaEvent,  # tool call streaming
-    ResponseCreatedEvent,  # start of new event like tool call or final answer
-    ResponseTextDeltaEvent
-)
+"""
+Bulk, offline study plan generation for instructors.
 
-# Remove duplicate load_dotenv and environment variable setting
-# since it's now handled by env_setup
-class Topic(BaseModel):
-    topic: str
-    description: str
-    subtopics: list[str]
-
-class ListOfTopics(BaseModel):
-    list_of_topics: list[Topic]  # Now it's a list of strings
-
-main_topic_outline_agent = Agent(
-    name="main_topic_outline_agent",
-    instructions="""
-    Generate five main topics based on the user's input. 
-    For each topic, provide a description and a list of 3 subtopics.
-    """,
-    output_type=ListOfTopics
-)
+Reads a JSONL file with one student (or cohort profile) per line, runs the
+topics -> quiz -> curate -> content pipeline for every line under one global
+concurrency / rate budget, and streams one JSON result per line to the output.
 
-curated_topic_outline_agent = Agent(
-    name="curated_topic_outline_agent",
-    instructions="""
-    You will be given the understanding of the topic by the user after they have answered the quiz.
-    You will then need to curate the topic based on the understanding of the topic.
-    Return the topics based on the order of the understanding from needing to learn first to the least.
-    """,
-    output_type=ListOfTopics
-)
+Input line format (only "subject" is required):
 
-class QuizQuestions(BaseModel):
-     topic: str
-     quiz_question: str
-     choice_a: str
-     choice_b: str
-     choice_c: str
-     choice_d: str
-     correct_answer: str
+    {"id": "student-17", "subject": "Linear Algebra",
+     "answers": ["a", "c", "b", ...],          # quiz answers, evaluated against the generated quiz
+     "scores": {"Eigenvalues": 40},            # or understanding % per topic (matched by topic name)
+     "default_score": 50}                      # for topics without an answer or score
 
-class ListOfQuizQuestions(BaseModel):
-     list_quiz_questions: list[QuizQuestions]
+Results are appended to the output as they finish, so a rerun with the same
+output file resumes: lines whose id already has a successful result are skipped
+and failed lines are retried. Within a line, every finished stage (topics, quiz,
+curated topics, each topic's content) is checkpointed under --checkpoint-dir,
+so a retried line only re-runs the stages that did not complete.
 
+Run from agent_backend/:
+    python llm_main.py cohort.jsonl plans.jsonl --concurrency 8 --rpm 120
+"""
 
-open_quiz_agent = Agent(
-    name="open_quiz_agent",
-    instructions="Read the given list of topics, and create 10 multiple choice quiz of a,b,c,d that covers all the topics. The correct answer should be a,b,c,d",
-    output_type=ListOfQuizQuestions,
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from app.core.rate_limit import TokenBucket
+from app.schemas import ContentTopic
+from app.services import pipeline
+from app.services.dag import CheckpointStore, DagExecutor
+from app.services.prompts import prompt_stats
+from app.services.llm_service import evaluate_quiz_understanding
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+logger = logging.getLogger("batch")
+
+
+class AgentBudget:
+    """Global budget shared by every line: at most `concurrency` agent runs at once, `rpm` starts per minute."""
+
+    def __init__(self, concurrency: int, rpm: Optional[float]):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._bucket = TokenBucket(rpm, burst=concurrency) if rpm else None
+        self.calls = 0
+
+    async def run(self, coro_fn, *args):
+        async with self._semaphore:
+            if self._bucket is not None:
+                await self._bucket.acquire()
+            self.calls += 1
+            return await coro_fn(*args)
+
+
+class Progress:
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.succeeded = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def report(self, budget: AgentBudget):
+        elapsed = time.monotonic() - self.started
+        done = self.succeeded + self.failed
+        remaining = self.total - self.skipped - done
+        per_min = done / elapsed * 60 if elapsed else 0.0
+        eta = f"{remaining / per_min:.1f} min" if per_min else "-"
+        logger.info(
+            f"{done}/{self.total - self.skipped} lines ({self.succeeded} ok, {self.failed} failed, "
+            f"{self.skipped} skipped) | {per_min:.1f} lines/min | "
+            f"{budget.calls / elapsed * 60 if elapsed else 0.0:.1f} agent calls/min | ETA {eta}"
+        )
 
-class ContentSub(BaseModel):
-    sub_topic_title: str
-    sub_content_text: str
 
-class ContentMain(BaseModel):
-    topic_title: str
-    main_description: str
-    subtopics: list[ContentSub]
+def line_id(record: dict, line_number: int) -> str:
+    return str(record.get("id", f"line-{line_number}"))
 
-class ContentTopic(BaseModel):
-     topic: list[ContentMain] 
 
+def load_completed_ids(output_path: str) -> set:
+    """Ids with a successful result in an existing output file (the resume checkpoint)."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue # A line cut short by a crash
+            if "error" not in result and "id" in result:
+                completed.add(result["id"])
+    return completed
 
 
-content_writer_agent = Agent(
-    name="content_writer_agent",
-    instructions="""You will be given a list of topics, for each topic, you will write a general main description for the topic. For each of the topics, you will be given a list of subtopics, you will write the subtopic title and the content for the subtopic. Focus on writing the content of the subtopics to be 1000+ words. In the content of the subtopics, try to add understanding of the key concepts, practical examples, real life applications (if applicable), summary of the subtopic and its connection to other subtopics.""",
-    output_type=ContentTopic
-)
+def understanding_scores(record: dict, topics, quiz) -> dict:
+    default_score = float(record.get("default_score", 50))
+    scores = {topic.topic: default_score for topic in topics.list_of_topics}
 
-def evaluate_quiz_understanding(quiz_results, user_answers):
-    """
-    Evaluate user's understanding of each topic based on quiz answers.
-    
-    Args:
-        quiz_results: ListOfQuizQuestions object from AI
-        user_answers: list of answers in format [{'question_index': 0, 'answer': 'a'}, ...]
-    
-    Returns:
-        dict: Topic understanding scores {topic: percentage}
-    """
-    # Initialize topic understanding dictionary
-    topic_understanding = {}
-    topic_question_count = {}
-    
-    # Process each question and answer
-    for i, question in enumerate(quiz_results.list_quiz_questions):
-        topic = question.topic
-        
-        # Initialize topic if not seen before
-        if topic not in topic_understanding:
-            topic_understanding[topic] = 0
-            topic_question_count[topic] = 0
-            
-        # Get user's answer for this question
-        user_answer = next((ans['answer'] for ans in user_answers if ans['question_index'] == i), None)
-        
-        # Compare answers
-        if user_answer and user_answer.lower() == question.correct_answer.lower():
-            topic_understanding[topic] += 1
-        topic_question_count[topic] += 1
-    
-    # Calculate percentages for each topic
-    for topic in topic_understanding:
-        if topic_question_count[topic] > 0:
-            topic_understanding[topic] = (topic_understanding[topic] / topic_question_count[topic]) * 100
-            
-    return topic_understanding
-
-async def main():
-    input_prompt = input("What is the main subject of the content? ")
-
-    with trace("Deterministic story flow"):
-        # 1. Generate an outline
-        main_topic_result = await Runner.run(
-            main_topic_outline_agent,
-            input_prompt,
-        )
-        print("List of topics generated")
-        # Access the list of topics and format them into a string
-        topics = main_topic_result.final_output.topics
-        topics_string = "\n".join(f"{i+1}. {topic}" for i, topic in enumerate(topics))
-        for topic in topics:
-            print(f"Topic: {topic}")
-
-        # 2. Create the first quiz question
-        open_quiz_result = await Runner.run(
-            open_quiz_agent,
-            f"Here are the topics:\n{topics_string}",  # Pass formatted string
-        )
-        print("Quiz question generated")
-        print(f"Quiz question: {open_quiz_result.final_output}")
-
-        # Demo list of user answers (simulate frontend input)
-        demo_user_answers = [
-            {'question_index': 0, 'answer': 'a'},
-            {'question_index': 1, 'answer': 'b'},
-            {'question_index': 2, 'answer': 'c'},
-            {'question_index': 3, 'answer': 'd'},
-            {'question_index': 4, 'answer': 'a'},
-            {'question_index': 5, 'answer': 'b'},
-            {'question_index': 6, 'answer': 'c'},
-            {'question_index': 7, 'answer': 'a'},
-            {'question_index': 8, 'answer': 'b'},
-            {'question_index': 9, 'answer': 'd'},
+    if record.get("answers"):
+        user_answers = [
+            answer if isinstance(answer, dict) else {"question_index": i, "answer": answer}
+            for i, answer in enumerate(record["answers"])
         ]
-        
-        # Evaluate understanding
-        understanding_scores = evaluate_quiz_understanding(
-            open_quiz_result.final_output,
-            demo_user_answers
-        )
-        
-        
-        # Format understanding scores into a string
-        understanding_summary = "\nUnderstanding by Topic:\n"
-        understanding_summary += "\n".join(f"{topic}: {score:.1f}%" for topic, score in understanding_scores.items())
-        print(understanding_summary)
-
-        # 3. Curate the topics
-        curated_topic_result = await Runner.run(
-            curated_topic_outline_agent,
-            f"Here is the main topic:\n{input_prompt}\nHere is the understanding of the topic:\n{understanding_scores}" # Pass formatted string
-        )
-        print("Curated topics generated")
-        print(f"Curated topics: {curated_topic_result.final_output}")
-
-        curated_topics = curated_topic_result.final_output.topics
-        curated_topics_string = "\n".join(f"{i+1}. {topic}" for i, topic in enumerate(curated_topics))
-        for topic in curated_topics:
-            print(f"Topic: {topic}")
-
-        # 4. Write the content for the curated_topics
-        content_result = await Runner.run(
-            content_writer_agent,
-            f"""Here are the topics to write content for:\n{curated_topics_string}, You need to output the main content, its description and the subtopics with the content for each subtopic.
-"""
-            ,  # Pass formatted string
-        )
-        print(f"Story: {content_result.final_output}")
+        # Partial answers only score the topics they cover; the rest keep default_score
+        answered = {answer.get("question_index") for answer in user_answers if answer.get("answer")}
+        answered_topics = {
+            question.topic for i, question in enumerate(quiz.list_quiz_questions) if i in answered
+        }
+        scores.update({
+            topic: score
+            for topic, score in evaluate_quiz_understanding(quiz, user_answers).items()
+            if topic in answered_topics
+        })
+    if record.get("scores"):
+        by_name = {name.strip().lower(): score for name, score in record["scores"].items()}
+        for topic in scores:
+            if topic.strip().lower() in by_name:
+                scores[topic] = float(by_name[topic.strip().lower()])
+    return scores
+
+
+async def process_line(record: dict, record_id: str, budget: AgentBudget, checkpoints: Optional[CheckpointStore]) -> dict:
+    started = time.monotonic()
+    subject = record["subject"]
+
+    # Content for each curated topic is its own DAG node, so topics are written in parallel under the shared budget
+    executor = DagExecutor(
+        pipeline.full_pipeline_stages(budget.run, understanding_scores),
+        checkpoints,
+    )
+    run = await executor.run({"subject": subject, "profile": record})
+    values = run.values
+
+    return {
+        "id": record_id,
+        "subject": subject,
+        "topics": values["topics"].model_dump(),
+        "quiz": values["quiz"].model_dump(),
+        "scores": values["scores"],
+        "curated_topics": values["curated"].model_dump(),
+        "content": ContentTopic(topic=list(values["content"])).model_dump(),
+        "checkpointed_stages": run.skipped,
+        "elapsed_s": round(time.monotonic() - started, 2),
+    }
+
+
+async def run_batch(args):
+    completed = load_completed_ids(args.output)
+    with open(args.input, "r", encoding="utf-8") as f:
+        total = sum(1 for line in f if line.strip())
+    progress = Progress(total, skipped=0)
+    budget = AgentBudget(args.concurrency, args.rpm)
+    checkpoints = None if args.no_checkpoints else CheckpointStore(args.checkpoint_dir or f"{args.output}.checkpoints")
+    write_lock = asyncio.Lock()
+    # Bounded, so only a window of the input is held in memory
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.max_inflight_lines)
+
+    out = open(args.output, "a", encoding="utf-8")
+
+    async def write_result(result: dict):
+        async with write_lock:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            record, record_id = item
+            try:
+                result = await process_line(record, record_id, budget, checkpoints)
+                progress.succeeded += 1
+            except Exception as e:
+                logger.error(f"Line {record_id} failed: {e}", exc_info=args.verbose)
+                result = {"id": record_id, "subject": record.get("subject"), "error": str(e)}
+                progress.failed += 1
+            await write_result(result)
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(args.report_every)
+            progress.report(budget)
+
+    workers = [asyncio.create_task(worker()) for _ in range(args.max_inflight_lines)]
+    reporter_task = asyncio.create_task(reporter())
+    try:
+        with open(args.input, "r", encoding="utf-8") as f:
+            line_number = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                line_number += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.error(f"Skipping invalid JSON on line {line_number}: {e}")
+                    progress.skipped += 1
+                    continue
+                if not isinstance(record, dict):
+                    # Valid JSON but not a line object; record it instead of aborting the batch
+                    logger.error(f"Line {line_number} is not a JSON object")
+                    await write_result({"id": f"line-{line_number}", "error": "Line is not a JSON object."})
+                    progress.failed += 1
+                    continue
+                record_id = line_id(record, line_number)
+                if record_id in completed or "subject" not in record:
+                    if "subject" not in record:
+                        logger.error(f"Skipping line {record_id}: no subject")
+                    progress.skipped += 1
+                    continue
+                await queue.put((record, record_id))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        reporter_task.cancel()
+        out.close()
+
+    progress.report(budget)
+    tokens = prompt_stats.stats()
+    logger.info(f"Prompt tokens: {tokens['tokens_sent']} sent, {tokens['tokens_saved']} saved by compaction ({tokens['saved_pct']}%)")
+    logger.info(f"Results written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of subjects and score profiles")
+    parser.add_argument("output", help="JSONL file to append results to (also the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="max concurrent agent runs across all lines")
+    parser.add_argument("--rpm", type=float, default=None, help="max agent runs started per minute")
+    parser.add_argument("--max-inflight-lines", type=int, default=8, help="lines processed at the same time")
+    parser.add_argument("--report-every", type=float, default=15.0, help="seconds between throughput reports")
+    parser.add_argument("--checkpoint-dir", default=None, help="stage checkpoints (default: <output>.checkpoints)")
+    parser.add_argument("--no-checkpoints", action="store_true", help="don't read or write stage checkpoints")
+    parser.add_argument("--verbose", action="store_true", help="log tracebacks of failed lines")
+    asyncio.run(run_batch(parser.parse_args()))
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
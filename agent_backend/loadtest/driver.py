@@ -0,0 +1,281 @@
+# agent_backend/loadtest/driver.py
+"""
+Replays the full CramPlan user journey against the backend at a target concurrency:
+
+  upload -> topics -> quiz -> evaluate -> curate -> content per topic -> delete
+
+By default the app runs in-process with the stub LLM backend (no network, no API
+spend). Pass --base-url to drive an already running server instead, e.g. one
+started with `python -m loadtest.serve`.
+
+Run from agent_backend/:
+  python -m loadtest.driver --users 20 --journeys 100 --content-latency lognormal:4,0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import time
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+# Settings are required at import time; the stub backend never uses them
+os.environ.setdefault("OPENAI_API_KEY", "sk-loadtest-stub")
+os.environ.setdefault("OPENAI_VECTOR_STORE_ID", "vs_loadtest_stub")
+
+from .stub_llm import Latency, StubConfig, install
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    response_bytes: int = 0
+    peak_alloc_bytes: Optional[int] = None # Filled in by the isolated memory pass
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class JourneyFailed(Exception):
+    pass
+
+
+class LoadDriver:
+    def __init__(self, client: httpx.AsyncClient, upload_bytes: int, parallel_topics: bool, seed: Optional[int]):
+        self.client = client
+        self.upload_bytes = upload_bytes
+        self.parallel_topics = parallel_topics
+        self.rng = random.Random(seed)
+        self.stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.on_request = None # optional hook(endpoint, phase) used by the memory pass
+
+    async def _post(self, endpoint: str, **kwargs) -> httpx.Response:
+        if self.on_request:
+            self.on_request(endpoint, "start")
+        started = time.perf_counter()
+        response = await self.client.post(endpoint, **kwargs)
+        elapsed = time.perf_counter() - started
+        if self.on_request:
+            self.on_request(endpoint, "end")
+
+        stats = self.stats[endpoint]
+        stats.latencies.append(elapsed)
+        stats.statuses[response.status_code] += 1
+        stats.response_bytes += len(response.content)
+        if response.status_code != 200:
+            raise JourneyFailed(f"{endpoint} returned {response.status_code}")
+        return response
+
+    async def journey(self, user_index: int):
+        user_id = f"loadtest-user-{user_index}"
+        subject = f"Subject {user_index % 50}"
+
+        payload = b"x" * self.upload_bytes
+        upload = await self._post(
+            "/upload-files",
+            data={"user_id": user_id},
+            files=[("course_notes", (f"notes-{user_index}.pdf", payload, "application/pdf"))],
+        )
+        file_ids = [d["vector_store_file_id"] for d in upload.json()["upload_details"] if d.get("vector_store_file_id")]
+
+        topics = (await self._post("/generate-topics", json={"subject": subject})).json()
+        quiz = (await self._post("/generate-quiz", json=topics)).json()
+
+        answers = [
+            {"question_index": i, "answer": self.rng.choice("abcd")}
+            for i in range(len(quiz["list_quiz_questions"]))
+        ]
+        scores = (await self._post("/evaluate-quiz", json={"quiz": quiz, "submission": {"answers": answers}})).json()
+
+        curated = (await self._post(
+            "/curate-topics",
+            json={"request": {"subject": subject}, "understanding": scores},
+        )).json()
+
+        topic_requests = [
+            self._post("/generate-single-topic", json={"topic": topic})
+            for topic in curated["list_of_topics"]
+        ]
+        if self.parallel_topics:
+            await asyncio.gather(*topic_requests)
+        else:
+            for request in topic_requests:
+                await request
+
+        await self._post("/delete-vector-files", json={"vector_store_file_ids": file_ids})
+
+    async def run(self, users: int, journeys: int) -> dict:
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(journeys):
+            queue.put_nowait(i)
+        outcome = {"completed": 0, "failed": 0}
+
+        async def virtual_user():
+            while True:
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self.journey(index)
+                    outcome["completed"] += 1
+                except (JourneyFailed, httpx.HTTPError):
+                    outcome["failed"] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[virtual_user() for _ in range(users)])
+        outcome["elapsed"] = time.perf_counter() - started
+        return outcome
+
+
+async def memory_pass(app, upload_bytes: int) -> Dict[str, int]:
+    """Runs one journey alone and records the peak traced allocation of each endpoint call."""
+    peaks: Dict[str, int] = defaultdict(int)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        driver = LoadDriver(client, upload_bytes, parallel_topics=False, seed=0)
+        baseline = {}
+
+        def on_request(endpoint, phase):
+            if phase == "start":
+                tracemalloc.reset_peak()
+                baseline[endpoint] = tracemalloc.get_traced_memory()[0]
+            else:
+                peak = tracemalloc.get_traced_memory()[1] - baseline[endpoint]
+                peaks[endpoint] = max(peaks[endpoint], peak)
+
+        driver.on_request = on_request
+        tracemalloc.start()
+        try:
+            await driver.journey(0)
+        finally:
+            tracemalloc.stop()
+    return dict(peaks)
+
+
+def build_report(driver: LoadDriver, outcome: dict, memory: Dict[str, int]) -> dict:
+    elapsed = outcome["elapsed"]
+    endpoints = {}
+    for endpoint, stats in driver.stats.items():
+        count = len(stats.latencies)
+        endpoints[endpoint] = {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 3) if elapsed else 0.0,
+            "statuses": dict(stats.statuses),
+            "p50_ms": round(stats.percentile(50) * 1000, 1),
+            "p90_ms": round(stats.percentile(90) * 1000, 1),
+            "p99_ms": round(stats.percentile(99) * 1000, 1),
+            "max_ms": round(max(stats.latencies) * 1000, 1) if stats.latencies else 0.0,
+            "avg_response_kb": round(stats.response_bytes / count / 1024, 1) if count else 0.0,
+            "peak_alloc_kb": round(memory[endpoint] / 1024, 1) if endpoint in memory else None,
+        }
+    return {
+        "journeys_completed": outcome["completed"],
+        "journeys_failed": outcome["failed"],
+        "elapsed_s": round(elapsed, 2),
+        "journeys_per_min": round(outcome["completed"] / elapsed * 60, 2) if elapsed else 0.0,
+        # ru_maxrss is in KiB on Linux
+        "process_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"\n{report['journeys_completed']} journeys completed, {report['journeys_failed']} failed "
+        f"in {report['elapsed_s']}s ({report['journeys_per_min']} journeys/min), "
+        f"driver process max RSS {report['process_max_rss_mb']} MB\n"
+    )
+    header = f"{'endpoint':<24}{'reqs':>6}{'rps':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'resp KB':>9}{'peak KB':>9}  statuses"
+    print(header)
+    print("-" * len(header))
+    for endpoint, e in report["endpoints"].items():
+        peak = "-" if e["peak_alloc_kb"] is None else f"{e['peak_alloc_kb']:.0f}"
+        print(
+            f"{endpoint:<24}{e['requests']:>6}{e['throughput_rps']:>8.2f}{e['p50_ms']:>10.1f}{e['p90_ms']:>10.1f}"
+            f"{e['p99_ms']:>10.1f}{e['max_ms']:>10.1f}{e['avg_response_kb']:>9.1f}{peak:>9}  {e['statuses']}"
+        )
+
+
+def stub_config_from_args(args) -> StubConfig:
+    config = StubConfig(
+        error_rate=args.error_rate,
+        topics=args.topics,
+        subtopics=args.subtopics,
+        quiz_questions=args.quiz_questions,
+        words_per_subtopic=args.words,
+        seed=args.seed,
+    )
+    config.agent_latency["default"] = Latency.parse(args.agent_latency)
+    config.agent_latency["content_writer_agent"] = Latency.parse(args.content_latency)
+    config.file_latency = Latency.parse(args.file_latency)
+    return config
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--agent-latency", default="lognormal:1.5,0.4", help="latency of topic/quiz/curation agents")
+    parser.add_argument("--content-latency", default="lognormal:8,0.5", help="latency of content_writer_agent")
+    parser.add_argument("--file-latency", default="uniform:0.2,0.6", help="latency of each files/vector store call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability an agent run fails")
+    parser.add_argument("--topics", type=int, default=5)
+    parser.add_argument("--subtopics", type=int, default=3)
+    parser.add_argument("--quiz-questions", type=int, default=10)
+    parser.add_argument("--words", type=int, default=1000, help="words per generated subtopic")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+async def main_async(args):
+    if args.base_url:
+        app = None
+        transport = None
+        client_kwargs = {"base_url": args.base_url}
+    else:
+        from app.main import app
+        install(stub_config_from_args(args))
+        transport = httpx.ASGITransport(app=app)
+        client_kwargs = {"base_url": "http://loadtest", "transport": transport}
+
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits, **client_kwargs) as client:
+        driver = LoadDriver(client, args.upload_kb * 1024, args.parallel_topics, args.seed)
+        outcome = await driver.run(args.users, args.journeys)
+
+    memory = {}
+    if app is not None and not args.skip_memory:
+        memory = await memory_pass(app, args.upload_kb * 1024)
+
+    report = build_report(driver, outcome, memory)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--journeys", type=int, default=50, help="total journeys to run")
+    parser.add_argument("--base-url", default=None, help="drive a running server instead of the in-process app")
+    parser.add_argument("--parallel-topics", action="store_true", help="request content for all topics at once")
+    parser.add_argument("--upload-kb", type=int, default=256, help="size of the uploaded course notes")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-request timeout in seconds")
+    parser.add_argument("--skip-memory", action="store_true", help="skip the isolated per-endpoint memory pass")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    add_stub_arguments(parser)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
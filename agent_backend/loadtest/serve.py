@@ -0,0 +1,34 @@
+# agent_backend/loadtest/serve.py
+"""
+Runs the API with the stub LLM backend installed, for load tests that go
+through a real HTTP server (`python -m loadtest.driver --base-url ...`).
+
+Run from agent_backend/:  python -m loadtest.serve --port 8000 --content-latency fixed:2
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-loadtest-stub")
+os.environ.setdefault("OPENAI_VECTOR_STORE_ID", "vs_loadtest_stub")
+
+from .driver import add_stub_arguments, stub_config_from_args
+from .stub_llm import install
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    from app.main import app
+    install(stub_config_from_args(args))
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# agent_backend/loadtest/stub_llm.py
+"""
+Local stand-ins for the agents Runner and the OpenAI files / vector store APIs,
+so the backend can be load tested without network access or API spend.
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+import re
+import sys
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from agents import Runner
+from openai import AsyncOpenAI
+
+from app.schemas import (
+    ContentMain,
+    ContentSub,
+    ContentTopic,
+    ListOfQuizQuestions,
+    ListOfTopics,
+    QuizQuestions,
+    Topic,
+)
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "concept theorem example proof definition property method application model "
+    "system process structure function relation analysis result principle"
+).split()
+
+
+class StubLLMError(RuntimeError):
+    pass
+
+
+@dataclass
+class Latency:
+    """
+    Latency distribution in seconds, parsed from a spec string:
+
+    - "fixed:2"             always 2s
+    - "uniform:1,3"         uniformly between 1s and 3s
+    - "lognormal:2,0.5"     lognormal with median 2s and sigma 0.5
+    - "exp:2"               exponential with mean 2s
+    """
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v.strip()] or [0.0]
+        if kind not in ("fixed", "uniform", "lognormal", "exp"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        return cls(kind=kind, a=values[0], b=values[1] if len(values) > 1 else 0.0)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(0.0, self.b) * self.a
+        if self.kind == "exp":
+            return rng.expovariate(1.0 / self.a) if self.a > 0 else 0.0
+        return self.a
+
+
+@dataclass
+class StubConfig:
+    # Latency per agent name; "default" applies to agents not listed
+    agent_latency: Dict[str, Latency] = field(default_factory=lambda: {
+        "default": Latency.parse("lognormal:1.5,0.4"),
+        "content_writer_agent": Latency.parse("lognormal:8,0.5"),
+    })
+    file_latency: Latency = field(default_factory=lambda: Latency.parse("uniform:0.2,0.6"))
+    error_rate: float = 0.0 # Probability that an agent run raises
+    topics: int = 5
+    subtopics: int = 3
+    quiz_questions: int = 10
+    words_per_subtopic: int = 1000
+    seed: Optional[int] = None
+
+    def latency_for(self, agent_name: str) -> Latency:
+        return self.agent_latency.get(agent_name, self.agent_latency["default"])
+
+
+class StubRunner:
+    """Drop-in for `agents.Runner` that fabricates output of the agent's output_type."""
+
+    config = StubConfig()
+    rng = random.Random()
+
+    @classmethod
+    async def run(cls, starting_agent, input, **kwargs):
+        await asyncio.sleep(cls.config.latency_for(starting_agent.name).sample(cls.rng))
+        if cls.rng.random() < cls.config.error_rate:
+            raise StubLLMError(f"Injected stub failure for {starting_agent.name}")
+        output = _fake_output(starting_agent.output_type, input, cls.config, cls.rng)
+        return SimpleNamespace(final_output=output, input=input)
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _topic_titles_from_prompt(prompt) -> list:
+    # Prompts list topics as "1. Title" / "Topic: Title"
+    text = prompt if isinstance(prompt, str) else ""
+    titles = re.findall(r"^\s*(?:\d+\.|Topic:)\s*(.+)$", text, flags=re.MULTILINE)
+    return [t.strip() for t in titles if t.strip()]
+
+
+def _fake_output(output_type, prompt, config: StubConfig, rng: random.Random):
+    if output_type is ListOfTopics:
+        return ListOfTopics(list_of_topics=[
+            Topic(
+                topic=f"Topic {i + 1} {rng.choice(WORDS)}",
+                description=_words(rng, 25),
+                subtopics=[f"Subtopic {i + 1}.{j + 1}" for j in range(config.subtopics)],
+            )
+            for i in range(config.topics)
+        ])
+    if output_type is ListOfQuizQuestions:
+        titles = _topic_titles_from_prompt(prompt) or [f"Topic {i + 1}" for i in range(config.topics)]
+        return ListOfQuizQuestions(list_quiz_questions=[
+            QuizQuestions(
+                topic=titles[i % len(titles)],
+                quiz_question=_words(rng, 15) + "?",
+                choice_a=_words(rng, 4),
+                choice_b=_words(rng, 4),
+                choice_c=_words(rng, 4),
+                choice_d=_words(rng, 4),
+                correct_answer=rng.choice("abcd"),
+            )
+            for i in range(config.quiz_questions)
+        ])
+    if output_type is ContentTopic:
+        titles = _topic_titles_from_prompt(prompt) or ["Topic"]
+        return ContentTopic(topic=[
+            ContentMain(
+                topic_title=titles[0],
+                main_description=_words(rng, 80),
+                subtopics=[
+                    ContentSub(sub_topic_title=f"Subtopic {j + 1}", sub_content_text=_words(rng, config.words_per_subtopic))
+                    for j in range(config.subtopics)
+                ],
+            )
+        ])
+    raise TypeError(f"Stub runner has no fake output for {output_type}")
+
+
+class _StubFiles:
+    def __init__(self, client: "StubOpenAIClient"):
+        self._client = client
+
+    async def create(self, file=None, purpose=None, **kwargs):
+        await self._client.sleep()
+        return SimpleNamespace(id=f"file-stub{next(self._client.ids)}", purpose=purpose)
+
+
+class _StubVectorStoreFiles:
+    def __init__(self, client: "StubOpenAIClient"):
+        self._client = client
+
+    async def create_and_poll(self, vector_store_id=None, file_id=None, **kwargs):
+        await self._client.sleep()
+        return SimpleNamespace(id=file_id, vector_store_id=vector_store_id, status="completed")
+
+    async def delete(self, vector_store_id=None, file_id=None, **kwargs):
+        await self._client.sleep()
+        return SimpleNamespace(id=file_id, deleted=True)
+
+
+class StubOpenAIClient:
+    """Covers the subset of AsyncOpenAI used by the upload and deletion endpoints."""
+
+    def __init__(self, config: StubConfig, rng: random.Random):
+        self.config = config
+        self.rng = rng
+        self.ids = itertools.count(1)
+        self.files = _StubFiles(self)
+        self.vector_stores = SimpleNamespace(files=_StubVectorStoreFiles(self))
+
+    async def sleep(self):
+        await asyncio.sleep(self.config.file_latency.sample(self.rng))
+
+
+def install(config: StubConfig):
+    """
+    Replaces `Runner` and `AsyncOpenAI` clients in every loaded `app.*` module.
+    Import the app (e.g. `app.main`) before calling this.
+    """
+    rng = random.Random(config.seed)
+    StubRunner.config = config
+    StubRunner.rng = rng
+    client = StubOpenAIClient(config, rng)
+
+    patched = []
+    for name, module in list(sys.modules.items()):
+        if not (name == "app" or name.startswith("app.")) or module is None:
+            continue
+        if getattr(module, "Runner", None) is Runner:
+            module.Runner = StubRunner
+            patched.append(f"{name}.Runner")
+        if isinstance(getattr(module, "client", None), AsyncOpenAI):
+            module.client = client
+            patched.append(f"{name}.client")
+    logger.info(f"Installed stub LLM backend: {', '.join(patched)}")
+    return patched
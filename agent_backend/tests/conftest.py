@@ -0,0 +1,36 @@
+# agent_backend/tests/conftest.py
+
+# Settings are read when the app is imported, so point every on-disk store at a
+# temporary directory and keep all state in memory before anything imports `app`.
+# Run from agent_backend/:  python -m pytest -q
+
+import os
+import tempfile
+
+_state_dir = tempfile.mkdtemp(prefix="agent_backend_tests_")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("OPENAI_VECTOR_STORE_ID", "vs_test")
+os.environ["STUDY_PLAN_STORE_DIR"] = os.path.join(_state_dir, "study_plans")
+os.environ["PDF_CACHE_DIR"] = os.path.join(_state_dir, "pdf_cache")
+os.environ["PIPELINE_CHECKPOINT_DIR"] = os.path.join(_state_dir, "checkpoints")
+for name in ("SHARED_STATE_PATH", "IDEMPOTENCY_SQLITE_PATH", "WEB_CONCURRENCY", "AGENT_MAX_RUNS_PER_MINUTE"):
+    os.environ.pop(name, None)
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main
+from loadtest.stub_llm import Latency, StubConfig, install
+
+# Agents and file uploads answer instantly, with generated but well-formed output
+install(StubConfig(
+    agent_latency={"default": Latency.parse("fixed:0")},
+    file_latency=Latency.parse("fixed:0"),
+    words_per_subtopic=40,
+    seed=0,
+))
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app.main.app)
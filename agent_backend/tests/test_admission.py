@@ -0,0 +1,114 @@
+# agent_backend/tests/test_admission.py
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.admission import PRIORITY_BULK, PRIORITY_INTERACTIVE, AdmissionController
+
+
+async def hold(controller: AdmissionController, release: asyncio.Event, priority: int = PRIORITY_INTERACTIVE, order=None, name=None):
+    async with controller.slot(priority):
+        if order is not None:
+            order.append(name)
+        await release.wait()
+
+
+def test_full_queue_fails_fast_with_retry_after():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+
+    async def main():
+        release = asyncio.Event()
+        tasks = [asyncio.ensure_future(hold(controller, release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(HTTPException) as exc:
+                async with controller.slot():
+                    pass
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+        return exc.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 503
+    assert int(error.headers["Retry-After"]) >= 1
+    assert controller.active == 0 and controller.queued == 0
+
+
+def test_queue_timeout_returns_503_and_frees_the_queue():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+
+    async def main():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(controller, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc:
+            async with controller.slot():
+                pass
+        assert controller.queued == 0
+        release.set()
+        await holder
+        return exc.value
+
+    assert asyncio.run(main()).status_code == 503
+    assert controller.active == 0
+
+
+def test_interactive_runs_are_admitted_before_bulk_runs():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+    order = []
+
+    async def main():
+        gate = asyncio.Event()
+        holder = asyncio.ensure_future(hold(controller, gate))
+        await asyncio.sleep(0.01)
+        done = asyncio.Event()
+        done.set()
+        bulk = asyncio.ensure_future(hold(controller, done, PRIORITY_BULK, order, "bulk"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.ensure_future(hold(controller, done, PRIORITY_INTERACTIVE, order, "interactive"))
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(holder, bulk, interactive)
+
+    asyncio.run(main())
+    assert order == ["interactive", "bulk"]
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+
+    async def main():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(controller, release))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(hold(controller, release))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        assert controller.queued == 0
+        release.set()
+        await holder
+
+    asyncio.run(main())
+    assert controller.active == 0
+
+
+def test_fan_out_calls_share_one_slot():
+    controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=5)
+    seen = []
+
+    async def agent_call(n):
+        seen.append((n, controller.active))
+        await asyncio.sleep(0.01)
+        return n
+
+    async def main():
+        async with controller.slot(PRIORITY_BULK, fan_out=True):
+            return await asyncio.gather(*(controller.call(agent_call, n) for n in range(5)))
+
+    assert asyncio.run(main()) == list(range(5))
+    assert all(active == 1 for _, active in seen)
+
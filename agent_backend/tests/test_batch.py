@@ -0,0 +1,70 @@
+# agent_backend/tests/test_batch.py
+
+import argparse
+import asyncio
+import json
+
+import llm_main
+from app.schemas import ListOfQuizQuestions, ListOfTopics, QuizQuestions, Topic
+
+
+def batch_args(tmp_path, lines) -> argparse.Namespace:
+    source = tmp_path / "in.jsonl"
+    source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return argparse.Namespace(
+        input=str(source),
+        output=str(tmp_path / "out.jsonl"),
+        concurrency=4,
+        rpm=None,
+        max_inflight_lines=2,
+        report_every=60.0,
+        checkpoint_dir=str(tmp_path / "checkpoints"),
+        no_checkpoints=False,
+        verbose=False,
+    )
+
+
+def read_results(args) -> dict:
+    with open(args.output, encoding="utf-8") as f:
+        return {result["id"]: result for result in map(json.loads, f)}
+
+
+def test_bad_lines_are_reported_without_aborting_the_batch(tmp_path):
+    args = batch_args(tmp_path, [
+        '{"id": "ok", "subject": "Linear Algebra"}',
+        "[1, 2]",
+        "not json",
+        '{"id": "no-subject"}',
+    ])
+    asyncio.run(llm_main.run_batch(args))
+
+    results = read_results(args)
+    assert "error" not in results["ok"] and len(results["ok"]["content"]["topic"]) > 0
+    assert "error" in results["line-2"]
+    assert "no-subject" not in results
+
+
+def test_rerun_skips_completed_lines(tmp_path):
+    args = batch_args(tmp_path, ['{"id": "a", "subject": "Calculus"}'])
+    asyncio.run(llm_main.run_batch(args))
+    asyncio.run(llm_main.run_batch(args))
+
+    with open(args.output, encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
+
+
+def quiz_for(topic_names) -> ListOfQuizQuestions:
+    return ListOfQuizQuestions(list_quiz_questions=[
+        QuizQuestions(
+            topic=name, quiz_question="?", choice_a="a", choice_b="b", choice_c="c", choice_d="d", correct_answer="a"
+        )
+        for name in topic_names
+    ])
+
+
+def test_partial_answers_keep_default_score_for_unanswered_topics():
+    topics = ListOfTopics(list_of_topics=[Topic(topic=name, description="", subtopics=[]) for name in ("A", "B", "C")])
+    quiz = quiz_for(["A", "B", "C"])
+    record = {"answers": ["a"], "default_score": 40, "scores": {"c": 90}}
+
+    assert llm_main.understanding_scores(record, topics, quiz) == {"A": 100.0, "B": 40.0, "C": 90.0}
@@ -0,0 +1,88 @@
+# agent_backend/tests/test_dag.py
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.services.dag import CheckpointStore, DagExecutor, Stage, StageFailed
+
+
+def counted(calls: list, name: str, fn):
+    def wrapper(*args):
+        calls.append(name)
+        return fn(*args)
+    return wrapper
+
+
+def make_stages(calls: list, fail_on=None) -> list:
+    def write(item):
+        if item == fail_on:
+            raise RuntimeError(f"failed on {item}")
+        return item.upper()
+
+    return [
+        Stage("outline", counted(calls, "outline", lambda subject: [f"{subject}-{i}" for i in range(3)]), ["subject"], "outline"),
+        Stage("write", counted(calls, "write", write), ["outline"], "content", fan_out=lambda outline: outline),
+    ]
+
+
+def test_retry_only_reruns_failed_nodes(tmp_path):
+    checkpoints = CheckpointStore(str(tmp_path))
+    calls = []
+
+    with pytest.raises(StageFailed):
+        asyncio.run(DagExecutor(make_stages(calls, fail_on="s-1"), checkpoints).run({"subject": "s"}))
+    assert calls.count("write") == 3
+
+    calls.clear()
+    run = asyncio.run(DagExecutor(make_stages(calls), checkpoints).run({"subject": "s"}))
+    assert run.values["content"] == ["S-0", "S-1", "S-2"]
+    assert calls == ["write"] # Outline and the two finished topics came from checkpoints
+    assert run.skipped == 3
+
+
+def test_discard_removes_a_finished_runs_checkpoints(tmp_path):
+    checkpoints = CheckpointStore(str(tmp_path))
+    run = asyncio.run(DagExecutor(make_stages([]), checkpoints).run({"subject": "s"}))
+    checkpoints.discard(run)
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 0
+
+
+def test_expired_checkpoints_are_ignored_and_pruned(tmp_path):
+    checkpoints = CheckpointStore(str(tmp_path), max_age_seconds=0.05)
+    stage = Stage("s", lambda x: x, ["x"], "y")
+    checkpoints.save(stage, "key", {"a": 1})
+    assert checkpoints.load(stage, "key") == (True, {"a": 1})
+
+    time.sleep(0.1)
+    assert checkpoints.load(stage, "key") == (False, None)
+    checkpoints.prune()
+    assert os.listdir(tmp_path / "s") == []
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        DagExecutor([Stage("a", lambda b: b, ["b"], "a"), Stage("b", lambda a: a, ["a"], "b")])
+
+
+def test_study_plan_runs_under_one_admission_slot(client, monkeypatch):
+    from app.core.admission import agent_admission
+
+    monkeypatch.setattr(agent_admission, "max_concurrent", 1)
+    monkeypatch.setattr(agent_admission, "max_queue", 0)
+    response = client.post("/generate-study-plan", json={"subject": "Thermodynamics", "scores": {"Entropy": 30}})
+
+    assert response.status_code == 200
+    plan = response.json()
+    assert len(plan["topic"]) > 0
+    assert client.get(f"/study-plans/{plan['plan_id']}").status_code == 200
+
+
+def test_oversized_generated_study_plan_returns_413(client, monkeypatch):
+    from app.services.study_plan_store import study_plan_store
+
+    monkeypatch.setattr(study_plan_store, "max_plan_bytes", 100)
+    response = client.post("/generate-study-plan", json={"subject": "Optics", "scores": {"Lenses": 50}})
+    assert response.status_code == 413
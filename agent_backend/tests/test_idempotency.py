@@ -0,0 +1,173 @@
+# agent_backend/tests/test_idempotency.py
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.idempotency import (
+    IN_PROGRESS,
+    IdempotencyStore,
+    MemoryIdempotencyBackend,
+    SQLiteIdempotencyBackend,
+    request_fingerprint,
+)
+from app.core.shared_state import SharedState
+
+
+def memory_store(**kwargs) -> IdempotencyStore:
+    backend = MemoryIdempotencyBackend(max_entries=100, ttl_seconds=3600, lease_seconds=60)
+    return IdempotencyStore(backend, wait_timeout=5, poll_interval=0.01, **kwargs)
+
+
+def counting_handler(result=None, delay: float = 0.0):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result or {"n": len(calls)}
+
+    return handler, calls
+
+
+def test_without_key_runs_every_time():
+    store = memory_store()
+    handler, calls = counting_handler()
+
+    async def main():
+        await store.run(None, "s", {"a": 1}, handler)
+        await store.run(None, "s", {"a": 1}, handler)
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_completed_request_is_replayed():
+    store = memory_store()
+    handler, calls = counting_handler()
+
+    async def main():
+        first = await store.run("k", "s", {"a": 1}, handler)
+        second = await store.run("k", "s", {"a": 1}, handler)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second == {"n": 1}
+    assert len(calls) == 1
+
+
+def test_key_reused_for_different_payload_is_rejected():
+    store = memory_store()
+    handler, _ = counting_handler()
+
+    async def main():
+        await store.run("k", "s", {"a": 1}, handler)
+        await store.run("k", "s", {"a": 2}, handler)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(main())
+    assert exc.value.status_code == 422
+
+
+def test_duplicate_attaches_to_in_progress_request():
+    store = memory_store()
+    handler, calls = counting_handler(delay=0.05)
+
+    async def main():
+        return await asyncio.gather(
+            store.run("k", "s", {"a": 1}, handler),
+            store.run("k", "s", {"a": 1}, handler),
+        )
+
+    assert asyncio.run(main()) == [{"n": 1}, {"n": 1}]
+    assert len(calls) == 1
+
+
+def test_failed_request_can_be_retried():
+    store = memory_store()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return {"ok": True}
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await store.run("k", "s", {"a": 1}, flaky)
+        return await store.run("k", "s", {"a": 1}, flaky)
+
+    assert asyncio.run(main()) == {"ok": True}
+    assert len(attempts) == 2
+
+
+def test_cancelled_request_finishes_and_is_replayed():
+    store = memory_store()
+    handler, calls = counting_handler(delay=0.05)
+
+    async def main():
+        first = asyncio.ensure_future(store.run("k", "s", {"a": 1}, handler))
+        await asyncio.sleep(0.01)
+        first.cancel() # Client disconnected
+        await asyncio.sleep(0.1)
+        return await store.run("k", "s", {"a": 1}, handler)
+
+    assert asyncio.run(main()) == {"n": 1}
+    assert len(calls) == 1
+
+
+def sqlite_backend(tmp_path, lease_seconds: float) -> SQLiteIdempotencyBackend:
+    state = SharedState(str(tmp_path / "state.sqlite3"))
+    return SQLiteIdempotencyBackend(state, max_entries=100, ttl_seconds=3600, lease_seconds=lease_seconds)
+
+
+def test_claim_of_dead_worker_is_taken_over(tmp_path):
+    backend = sqlite_backend(tmp_path, lease_seconds=0.2)
+    fingerprint = request_fingerprint({"a": 1})
+    stale = time.time() - 1
+    with backend.state.locked() as conn:
+        conn.execute(
+            "INSERT INTO idempotency_records (key, fingerprint, status, created_at, owner, claimed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            ("s:k", fingerprint, IN_PROGRESS, stale, 999999, stale),
+        )
+    store = IdempotencyStore(backend, wait_timeout=5, poll_interval=0.01)
+    handler, calls = counting_handler()
+
+    assert asyncio.run(store.run("k", "s", {"a": 1}, handler)) == {"n": 1}
+    assert len(calls) == 1
+
+
+def test_renewed_claim_is_not_taken_over(tmp_path):
+    backend = sqlite_backend(tmp_path, lease_seconds=0.2)
+    # Two stores on one backend behave like two workers sharing the database
+    owner = IdempotencyStore(backend, wait_timeout=5, poll_interval=0.01, heartbeat_interval=0.05)
+    retry = IdempotencyStore(backend, wait_timeout=5, poll_interval=0.01)
+    slow, slow_calls = counting_handler(result={"from": "owner"}, delay=0.5)
+    fast, fast_calls = counting_handler(result={"from": "retry"})
+
+    async def main():
+        first = asyncio.ensure_future(owner.run("k", "s", {"a": 1}, slow))
+        await asyncio.sleep(0.05)
+        return await retry.run("k", "s", {"a": 1}, fast), await first
+
+    assert asyncio.run(main()) == ({"from": "owner"}, {"from": "owner"})
+    assert len(slow_calls) == 1 and not fast_calls
+
+
+def test_upload_replays_by_key_and_rejects_changed_files(client):
+    def upload(content: bytes, key: str):
+        return client.post(
+            "/upload-files",
+            data={"user_id": "u1"},
+            files={"course_notes": ("notes.txt", content)},
+            headers={"Idempotency-Key": key},
+        )
+
+    first = upload(b"chapter one", "upload-1")
+    assert first.status_code == 200
+    replay = upload(b"chapter one", "upload-1")
+    assert replay.json() == first.json()
+    assert upload(b"chapter two", "upload-1").status_code == 422
@@ -0,0 +1,49 @@
+# agent_backend/tests/test_loadtest.py
+
+import asyncio
+import random
+
+import httpx
+import pytest
+
+import app.main
+from loadtest.driver import EndpointStats, LoadDriver
+from loadtest.stub_llm import Latency
+
+
+@pytest.mark.parametrize(
+    "spec, low, high",
+    [
+        ("fixed:2", 2.0, 2.0),
+        ("uniform:1,3", 1.0, 3.0),
+        ("exp:0", 0.0, 0.0),
+    ],
+)
+def test_latency_samples_stay_in_range(spec, low, high):
+    latency = Latency.parse(spec)
+    rng = random.Random(0)
+    assert all(low <= latency.sample(rng) <= high for _ in range(100))
+
+
+def test_unknown_latency_distribution_is_rejected():
+    with pytest.raises(ValueError):
+        Latency.parse("normal:1")
+
+
+def test_percentile():
+    stats = EndpointStats(latencies=[float(n) for n in range(1, 101)])
+    assert stats.percentile(50) == 50.0
+    assert stats.percentile(99) == 99.0
+    assert EndpointStats().percentile(50) == 0.0
+
+
+def test_full_journey_against_the_stub_backend():
+    async def main():
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            driver = LoadDriver(client, upload_bytes=1024, parallel_topics=True, seed=0)
+            return driver, await driver.run(users=2, journeys=2)
+
+    driver, outcome = asyncio.run(main())
+    assert outcome["completed"] == 2 and outcome["failed"] == 0
+    assert set(driver.stats["/generate-single-topic"].statuses) == {200}
@@ -0,0 +1,99 @@
+# agent_backend/tests/test_pdf_export.py
+
+import re
+import time
+
+from app.services.pdf_export import (
+    FONT_REGULAR,
+    PdfCache,
+    encode_text,
+    markdown_blocks,
+    render_pdf,
+    text_width,
+    wrap,
+)
+
+
+def test_wrap_keeps_every_word_and_fits_the_width():
+    text = encode_text("Eigenvalues of a matrix are the roots of its characteristic polynomial. " * 20)
+    lines = wrap(text, FONT_REGULAR, 11, 200)
+
+    assert b" ".join(lines).split() == text.split()
+    assert all(text_width(line, FONT_REGULAR, 11) <= 200 for line in lines)
+    assert len(lines) > 1
+
+
+def test_wrap_splits_words_wider_than_a_line():
+    word = b"x" * 500
+    lines = wrap(b"start " + word + b" end", FONT_REGULAR, 11, 100)
+
+    assert lines[0] == b"start"
+    assert b"".join(lines[1:-1]) + lines[-1].split()[0] == word
+    assert lines[-1].endswith(b"end")
+    assert all(text_width(line, FONT_REGULAR, 11) <= 100 for line in lines)
+
+
+def test_symbols_outside_winansi_are_transliterated():
+    assert encode_text("det(A − λI) ≤ 0") == b"det(A - lambdaI) <= 0"
+    assert encode_text("α") == b"alpha"
+
+
+def test_markdown_blocks():
+    lines = ["# Plan", "## Day 1", "Some **bold** text", "- bullet", "1. numbered", "```", "code", "```"]
+    blocks = [(block.kind, block.text, block.marker) for block in markdown_blocks(lines)]
+    assert blocks == [
+        ("h1", "Plan", ""),
+        ("h2", "Day 1", ""),
+        ("para", "Some bold text", ""),
+        ("bullet", "bullet", "•"),
+        ("bullet", "numbered", "1."),
+        ("code", "code", ""),
+    ]
+
+
+def test_rendered_pdf_has_a_valid_trailer():
+    pdf = b"".join(render_pdf("Plan", markdown_blocks(["# Plan", "text " * 2000])))
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    xref_offset = int(re.search(rb"startxref\n(\d+)\n", pdf).group(1))
+    assert pdf[xref_offset:xref_offset + 4] == b"xref"
+
+
+def test_cache_evicts_least_recently_served_pdfs(tmp_path):
+    cache = PdfCache(str(tmp_path), max_total_bytes=250)
+    for key in ("aa01", "bb02"):
+        list(cache.store_while_streaming(key, [b"x" * 100]))
+        time.sleep(0.01)
+    assert cache.get("aa01") is not None # Served, so now the most recent
+    time.sleep(0.01)
+    list(cache.store_while_streaming("cc03", [b"x" * 100]))
+
+    assert cache.get("bb02") is None
+    assert cache.get("aa01") is not None and cache.get("cc03") is not None
+
+
+def test_cut_short_stream_is_not_cached(tmp_path):
+    cache = PdfCache(str(tmp_path))
+
+    def chunks():
+        yield b"partial"
+        raise RuntimeError("render failed")
+
+    stream = cache.store_while_streaming("dd04", chunks())
+    assert next(stream) == b"partial"
+    try:
+        next(stream)
+    except RuntimeError:
+        pass
+    assert cache.get("dd04") is None
+    assert list((tmp_path / "dd").iterdir()) == []
+
+
+def test_repeat_download_is_served_from_the_cache(client):
+    body = {"title": "Cached", "content": "# Plan\n\n## Day 1\n\nStudy vectors."}
+    first = client.post("/generate-pdf-from-text", json=body)
+    second = client.post("/generate-pdf-from-text", json=body)
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content and first.content.startswith(b"%PDF")
+    assert "content-length" not in first.headers # Streamed while rendering
+    assert second.headers["content-length"] == str(len(second.content))
@@ -0,0 +1,80 @@
+# agent_backend/tests/test_prompts.py
+
+from types import SimpleNamespace
+
+from app.schemas import Topic
+from app.services.prompts import (
+    BuiltPrompt,
+    PromptStats,
+    build_prompt,
+    compact_topics,
+    count_tokens,
+    dedupe_topics,
+    truncate_to_tokens,
+)
+
+
+def topic(title: str, description: str = "", subtopics=()) -> Topic:
+    return Topic(topic=title, description=description, subtopics=list(subtopics))
+
+
+def test_dedupe_merges_topics_and_keeps_subtopics_per_topic():
+    topics = dedupe_topics([
+        topic("Vectors", "Vectors. Vectors have length. Vectors have length.", ["Span", "span", "Vectors"]),
+        topic("vectors ", "", ["Basis"]),
+        topic("Matrices", "Matrices", ["Span"]),
+    ])
+
+    assert [t.topic for t in topics] == ["Vectors", "Matrices"]
+    assert topics[0].subtopics == ["Span", "Basis"]
+    assert topics[0].description.count("Vectors have length.") == 1
+    # Same subtopic title under another topic is a different subtopic
+    assert topics[1].subtopics == ["Span"] and topics[1].description == ""
+
+
+def test_compact_topics_trims_detail_to_fit_the_budget():
+    topics = [
+        topic(f"Topic {i}", "First sentence here. " + "More detail follows. " * 20, [f"Sub {i}.{j}" for j in range(6)])
+        for i in range(5)
+    ]
+    full = compact_topics(topics, budget=100_000)
+    tight = compact_topics(topics, budget=120)
+
+    assert "More detail follows." in full
+    assert count_tokens(tight) <= 120
+    assert all(f"{i+1}. Topic {i}" in tight for i in range(5))
+
+
+def test_compact_topics_can_keep_every_subtopic():
+    topics = [topic(f"Topic {i}", "Long description. " * 30, [f"Sub {i}.{j}" for j in range(6)]) for i in range(3)]
+    text = compact_topics(topics, budget=10, numbered=False, keep_subtopics=True)
+
+    assert "Long description" not in text
+    assert all(f"Sub {i}.{j}" in text for i in range(3) for j in range(6))
+    assert text.startswith("Topic: Topic 0")
+
+
+def test_truncate_to_tokens():
+    text = "word " * 500
+    assert count_tokens(truncate_to_tokens(text, 50)) <= 50
+    assert truncate_to_tokens("short", 50) == "short"
+
+
+def test_build_prompt_keeps_the_task_as_a_stable_prefix():
+    agent = SimpleNamespace(name="test_agent", instructions="Be brief.")
+    built = build_prompt(agent, "Write a quiz.", "Topic: Vectors", context="Course: Linear Algebra")
+
+    assert built.text == "Write a quiz.\n\nCourse: Linear Algebra\n\nTopic: Vectors"
+    assert built.prefix_tokens == count_tokens("Be brief.") + count_tokens("Write a quiz.")
+
+
+def test_stats_never_count_negative_savings():
+    stats = PromptStats()
+    stats.record(BuiltPrompt("agent", "", tokens=100, prefix_tokens=10, baseline_tokens=160))
+    stats.record(BuiltPrompt("agent", "", tokens=120, prefix_tokens=10, baseline_tokens=80))
+
+    report = stats.stats()
+    assert report["tokens_sent"] == 220
+    assert report["tokens_saved"] == 60
+    assert report["agents"]["agent"]["tokens_saved"] == 60
+    assert report["saved_pct"] == round(100 * 60 / 280, 1)
@@ -0,0 +1,94 @@
+# agent_backend/tests/test_question_bank.py
+
+import asyncio
+
+import pytest
+
+from app.schemas import ListOfTopics, QuizQuestions, Topic
+from app.services import pipeline
+from app.services.pipeline import assemble_quiz, balanced_counts
+from app.services.question_bank import QuestionBank, topic_key, validate_question
+
+
+def question(text: str, topic: str = "Vectors", answer: str = "a") -> QuizQuestions:
+    return QuizQuestions(
+        topic=topic, quiz_question=text, choice_a="1", choice_b="2", choice_c="3", choice_d="4", correct_answer=answer
+    )
+
+
+def topic_list(*names: str) -> ListOfTopics:
+    return ListOfTopics(list_of_topics=[Topic(topic=name, description="", subtopics=[]) for name in names])
+
+
+@pytest.mark.parametrize(
+    "available, total, expected",
+    [
+        ([10, 10, 10], 10, [4, 3, 3]),
+        ([1, 10, 10], 10, [1, 5, 4]),
+        ([0, 2], 10, [0, 2]),
+    ],
+)
+def test_balanced_counts(available, total, expected):
+    assert balanced_counts(available, total) == expected
+
+
+def test_validate_question_normalizes_the_answer():
+    assert validate_question(question("Q?", answer=" B) "), "Vectors").correct_answer == "b"
+    assert validate_question(question("Q?", answer="e"), "Vectors") is None
+    assert validate_question(question("  "), "Vectors") is None
+
+
+def test_bank_dedupes_and_hands_out_questions_round_robin():
+    bank = QuestionBank(max_per_topic=4, max_topics=10)
+    added = bank.add("k", [question(f"Question {i}?") for i in range(3)] + [question("question 0")])
+    assert added == 3
+
+    first = [q.quiz_question for q in bank.take("k", 2)]
+    second = [q.quiz_question for q in bank.take("k", 2)]
+    assert first == ["Question 0?", "Question 1?"]
+    assert second == ["Question 2?", "Question 0?"]
+
+
+def test_least_recently_used_topic_is_evicted():
+    bank = QuestionBank(max_per_topic=4, max_topics=2)
+    bank.add("a", [question("A?")])
+    bank.add("b", [question("B?")])
+    bank.take("a", 1)
+    bank.add("c", [question("C?")])
+    assert bank.count("b") == 0 and bank.count("a") == 1
+
+
+def test_topic_key_is_scoped():
+    assert topic_key("course-1", "Linear Algebra") == topic_key("course-1", "linear  algebra basics")
+    assert topic_key("course-1", "Linear Algebra") != topic_key("course-2", "Linear Algebra")
+
+
+def test_second_quiz_comes_from_the_bank_and_uses_current_titles(monkeypatch):
+    monkeypatch.setattr(pipeline, "question_bank", QuestionBank(max_per_topic=20, max_topics=100))
+    calls = []
+
+    async def guard(fn, *args):
+        calls.append(args[0].topic)
+        return await fn(*args)
+
+    async def main():
+        first = await assemble_quiz(topic_list("Eigenvalues", "Determinants"), guard, "course")
+        second = await assemble_quiz(topic_list("eigenvalues", "Determinants basics"), guard, "course")
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert sorted(calls) == ["Determinants", "Eigenvalues"]
+    assert {q.topic for q in second.list_quiz_questions} == {"eigenvalues", "Determinants basics"}
+    assert len(second.list_quiz_questions) == len(first.list_quiz_questions)
+
+
+def test_quiz_for_many_topics_fits_one_admission_slot(client, monkeypatch):
+    from app.core.admission import agent_admission
+
+    monkeypatch.setattr(agent_admission, "max_concurrent", 1)
+    monkeypatch.setattr(agent_admission, "max_queue", 0)
+    body = {"list_of_topics": [{"topic": f"Admission topic {i}", "description": "", "subtopics": []} for i in range(6)]}
+
+    response = client.post("/generate-quiz", json=body)
+    assert response.status_code == 200
+    assert len(response.json()["list_quiz_questions"]) > 0
@@ -0,0 +1,51 @@
+# agent_backend/tests/test_responses.py
+
+import json
+
+import pytest
+
+from app.core import compression
+from app.core.compression import negotiate_encoding
+from app.core.responses import dump_json
+from app.schemas import Topic, TopicResponse
+
+
+def test_dump_json_matches_model_and_plain_data():
+    topics = TopicResponse(list_of_topics=[Topic(topic="Vectors", description="λ basics", subtopics=["Span"])])
+    assert json.loads(dump_json(topics)) == topics.model_dump()
+    assert json.loads(dump_json({"topics": [topics], "n": 1})) == {"topics": [topics.model_dump()], "n": 1}
+
+
+@pytest.mark.parametrize(
+    "header, with_brotli, expected",
+    [
+        ("", True, None),
+        ("identity", True, None),
+        ("gzip, deflate", True, "gzip"),
+        ("gzip, deflate, br", True, "br"),
+        ("gzip, deflate, br", False, "gzip"),
+        ("br;q=0.5, gzip;q=0.8", True, "gzip"),
+        ("gzip;q=0", True, None),
+        ("*", False, "gzip"),
+    ],
+)
+def test_negotiate_encoding(monkeypatch, header, with_brotli, expected):
+    monkeypatch.setattr(compression, "brotli", object() if with_brotli else None)
+    assert negotiate_encoding(header) == expected
+
+
+def test_large_responses_are_compressed_and_small_ones_are_not(client):
+    topic = {
+        "topic_title": "Compression",
+        "main_description": "repeated text " * 20,
+        "subtopics": [{"sub_topic_title": "Sub", "sub_content_text": "repeated text " * 500}],
+    }
+    plan_id = client.post("/study-plans", json={"title": "Compressed", "topic": [topic]}).json()["plan_id"]
+
+    large = client.get(f"/study-plans/{plan_id}", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in large.headers["vary"]
+    assert large.json()["topic"] == [topic]
+
+    small = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
@@ -0,0 +1,100 @@
+# agent_backend/tests/test_shared_state.py
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+from app.core import admission
+from app.core.rate_limit import SharedTokenBucket
+from app.core.shared_state import SharedState, call_store
+from app.schemas import QuizQuestions
+from app.services.question_bank import QuestionBank, SQLiteQuestionBank
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def question(text: str) -> QuizQuestions:
+    return QuizQuestions(
+        topic="Vectors", quiz_question=text, choice_a="1", choice_b="2", choice_c="3", choice_d="4", correct_answer="a"
+    )
+
+
+def run_in_other_process(code: str):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, check=True, timeout=60)
+
+
+def test_question_bank_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    run_in_other_process(
+        "from app.core.shared_state import SharedState\n"
+        "from app.schemas import QuizQuestions\n"
+        "from app.services.question_bank import SQLiteQuestionBank\n"
+        f"bank = SQLiteQuestionBank(SharedState({path!r}), max_per_topic=20, max_topics=10)\n"
+        "bank.add('k', [QuizQuestions(topic='t', quiz_question=f'Q{i}?', choice_a='1', choice_b='2',"
+        " choice_c='3', choice_d='4', correct_answer='a') for i in range(3)])\n"
+    )
+
+    bank = SQLiteQuestionBank(SharedState(path), max_per_topic=20, max_topics=10)
+    assert bank.count("k") == 3
+    assert bank.add("k", [question("q0")]) == 0 # Already banked by the other process
+
+
+def test_rotation_continues_across_workers(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    first = SQLiteQuestionBank(SharedState(path), max_per_topic=20, max_topics=10)
+    second = SQLiteQuestionBank(SharedState(path), max_per_topic=20, max_topics=10)
+    first.add("k", [question(f"Q{i}?") for i in range(4)])
+
+    taken = [q.quiz_question for q in first.take("k", 2)] + [q.quiz_question for q in second.take("k", 2)]
+    assert sorted(taken) == ["Q0?", "Q1?", "Q2?", "Q3?"]
+
+
+def test_rate_limit_budget_is_shared(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    buckets = [SharedTokenBucket(SharedState(path), "agent_runs", rate_per_minute=1, burst=2) for _ in range(2)]
+
+    assert buckets[0].try_acquire() == 0
+    assert buckets[1].try_acquire() == 0
+    assert buckets[0].try_acquire() > 0
+
+
+def test_call_store_runs_shared_state_queries_off_the_event_loop(tmp_path):
+    shared = SQLiteQuestionBank(SharedState(str(tmp_path / "state.sqlite3")), max_per_topic=20, max_topics=10)
+    local = QuestionBank(max_per_topic=20, max_topics=10)
+    threads = {}
+
+    def record(name, method):
+        def wrapper(*args):
+            threads[name] = threading.get_ident()
+            return method(*args)
+        wrapper.__self__ = method.__self__
+        return wrapper
+
+    async def main():
+        loop_thread = threading.get_ident()
+        await call_store(record("shared", shared.count), "k")
+        await call_store(record("local", local.count), "k")
+        return loop_thread
+
+    loop_thread = asyncio.run(main())
+    assert threads["shared"] != loop_thread
+    assert threads["local"] == loop_thread
+
+
+def test_admission_limits_are_split_between_workers(monkeypatch):
+    monkeypatch.setattr(admission.settings, "WEB_CONCURRENCY", 4)
+    assert admission._worker_share(32) == 8
+    assert admission._worker_share(2) == 1 # Never below one slot
+
+
+def test_gunicorn_defaults_to_two_workers(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k not in ("WEB_CONCURRENCY", "SHARED_STATE_PATH")}
+    output = subprocess.run(
+        [sys.executable, "-c", "import runpy, os; c = runpy.run_path('gunicorn.conf.py');"
+         " print(c['workers'], os.environ['WEB_CONCURRENCY'], os.environ['SHARED_STATE_PATH'])"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True, timeout=60,
+    ).stdout.split()
+    assert output == ["2", "2", "data/shared_state.sqlite3"]
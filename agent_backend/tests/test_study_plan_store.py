@@ -0,0 +1,76 @@
+# agent_backend/tests/test_study_plan_store.py
+
+import json
+import os
+import time
+
+import pytest
+
+from app.services.study_plan_store import StudyPlanStore, StudyPlanTooLarge, study_plan_store
+
+
+def make_topics(count: int, words: int = 50) -> list:
+    return [
+        {
+            "topic_title": f"Topic {i}",
+            "main_description": "description " * 5,
+            "subtopics": [{"sub_topic_title": f"Sub {i}", "sub_content_text": f"word{i} " * words}],
+        }
+        for i in range(count)
+    ]
+
+
+def test_plan_round_trips_and_is_content_addressed(tmp_path):
+    store = StudyPlanStore(str(tmp_path), codec="gzip")
+    topics = make_topics(3)
+    manifest = store.save("Plan", topics)
+
+    assert store.save("Plan", topics).plan_id == manifest.plan_id
+    assert json.loads(store.read_topic(manifest, 1)) == topics[1]
+    plan = json.loads(store.read_plan(manifest))
+    assert plan["title"] == "Plan" and plan["topic"] == topics
+    # Only the finished plan directory is left behind
+    assert os.listdir(tmp_path) == [manifest.plan_id]
+
+
+def test_oversized_plan_is_rejected(tmp_path):
+    store = StudyPlanStore(str(tmp_path), codec="gzip", max_plan_bytes=200)
+    with pytest.raises(StudyPlanTooLarge):
+        store.save("Plan", make_topics(3))
+    assert os.listdir(tmp_path) == []
+
+
+def test_oldest_plans_are_evicted_beyond_the_store_limit(tmp_path):
+    store = StudyPlanStore(str(tmp_path), codec="gzip")
+    first = store.save("First", make_topics(2, words=2000))
+    plan_size = sum(f.stat().st_size for f in os.scandir(tmp_path / first.plan_id))
+    store.max_total_bytes = int(plan_size * 2.5)
+
+    ids = [first.plan_id]
+    for title in ("Second", "Third"):
+        time.sleep(0.01) # Distinct mtimes
+        ids.append(store.save(title, make_topics(2, words=2000)).plan_id)
+
+    assert store.get_manifest(ids[0]) is None
+    assert store.get_manifest(ids[1]) is not None and store.get_manifest(ids[2]) is not None
+
+
+def test_get_returns_etag_and_304(client):
+    saved = client.post("/study-plans", json={"title": "Plan", "topic": make_topics(2)}).json()
+    url = f"/study-plans/{saved['plan_id']}"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["etag"] == saved["etag"]
+    assert client.get(url, headers={"If-None-Match": saved["etag"]}).status_code == 304
+
+    topic = client.get(f"{url}/topics/1")
+    assert topic.json()["topic_title"] == "Topic 1"
+    assert client.get(f"{url}/topics/1", headers={"If-None-Match": topic.headers["etag"]}).status_code == 304
+    assert client.get("/study-plans/doesnotexist").status_code == 404
+
+
+def test_oversized_plan_returns_413(client, monkeypatch):
+    monkeypatch.setattr(study_plan_store, "max_plan_bytes", 100)
+    response = client.post("/study-plans", json={"title": "Too large", "topic": make_topics(2)})
+    assert response.status_code == 413
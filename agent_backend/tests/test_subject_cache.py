@@ -0,0 +1,59 @@
+# agent_backend/tests/test_subject_cache.py
+
+from app.core.shared_state import SharedState
+from app.services.subject_cache import (
+    SQLiteSubjectSimilarityIndex,
+    SubjectSimilarityIndex,
+    cache_namespace,
+    normalize_subject,
+)
+from app.schemas import Topic, TopicResponse
+
+
+def topics(name: str) -> TopicResponse:
+    return TopicResponse(list_of_topics=[Topic(topic=name, description="d", subtopics=["s"])])
+
+
+def test_normalize_drops_filler_words_and_course_codes():
+    assert normalize_subject("Intro to Linear Algebra (MATH1051)") == ["algebra", "linear"]
+    assert normalize_subject("Linear   algebra, basics") == normalize_subject("ALGEBRA LINEAR")
+
+
+def test_near_duplicate_subject_is_a_hit():
+    index = SubjectSimilarityIndex(threshold=0.7)
+    index.add("topics", "Linear Algebra", "cached")
+
+    hit = index.lookup("topics", "Introduction to Linear Algebra")
+    assert hit is not None and hit.value == "cached" and hit.matched_subject == "Linear Algebra"
+    assert index.lookup("topics", "Organic Chemistry") is None
+    assert index.stats()["hits"] == 1 and index.stats()["lookups"] == 2
+
+
+def test_namespaces_are_kept_apart():
+    index = SubjectSimilarityIndex(threshold=0.7)
+    index.add(cache_namespace("topic_agent", "material-a"), "Linear Algebra", "a")
+    assert index.lookup(cache_namespace("topic_agent", "material-b"), "Linear Algebra") is None
+    assert index.lookup(cache_namespace("quiz_agent", "material-a"), "Linear Algebra") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    index = SubjectSimilarityIndex(threshold=0.9, max_entries=2)
+    index.add("n", "Linear Algebra", 1)
+    index.add("n", "Organic Chemistry", 2)
+    assert index.lookup("n", "Linear Algebra") is not None # Now the most recent
+    index.add("n", "Medieval History", 3)
+
+    assert index.lookup("n", "Organic Chemistry") is None
+    assert index.lookup("n", "Linear Algebra").value == 1
+    assert index.lookup("n", "Medieval History").value == 3
+
+
+def test_sqlite_index_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    writer = SQLiteSubjectSimilarityIndex(SharedState(path), threshold=0.7)
+    reader = SQLiteSubjectSimilarityIndex(SharedState(path), threshold=0.7)
+    writer.add("topics", "Linear Algebra", topics("Vectors"))
+
+    hit = reader.lookup("topics", "linear algebra basics")
+    assert hit is not None
+    assert TopicResponse.model_validate(hit.value) == topics("Vectors")
@@ -250,6 +250,25 @@ export default function AssessmentPage() {
       const finalStudyPlanContent = { topic: allGeneratedContent }; 
       localStorage.setItem('studyPlanContent', JSON.stringify(finalStudyPlanContent));
       console.log('Complete study plan content saved:', finalStudyPlanContent);
+
+      // Also store the plan server-side so it can be reloaded without regenerating
+      try {
+        const saveResponse = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/study-plans`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ title: storedSubject, topic: allGeneratedContent }),
+        });
+        if (saveResponse.ok) {
+          const savedPlan = await saveResponse.json();
+          localStorage.setItem('studyPlanId', savedPlan.plan_id);
+          console.log('Study plan stored on server:', savedPlan.plan_id);
+        } else {
+          console.error(`Failed to store study plan on server: ${saveResponse.statusText}`);
+        }
+      } catch (error) {
+        // Not fatal, the plan is still available from localStorage
+        console.error('Error storing study plan on server:', error);
+      }
       
       router.push("/study-plan");
 
@@ -201,32 +201,56 @@ export default function StudyPlanPage() {
   const [showConfetti, setShowConfetti] = useState(false)
   const [isPdfGenerating, setIsPdfGenerating] = useState(false)
 
-  // Load study content from localStorage on component mount
+  // Load study content on component mount: from localStorage, or from the server-side
+  // plan store when opened via ?plan=<id> (e.g. on another device)
   useEffect(() => {
-    try {
-      const storedContent = localStorage.getItem('studyPlanContent')
-      if (storedContent) {
-        const parsedContent = JSON.parse(storedContent) as StudyContent
-        console.log('Loaded study content from localStorage:', parsedContent)
-        setStudyContent(parsedContent)
+    const applyContent = (parsedContent: StudyContent) => {
+      setStudyContent(parsedContent)
+      
+      // Transform the content into the study plan format
+      if (parsedContent && parsedContent.topic && parsedContent.topic.length > 0) {
+        const transformedData = transformContentToStudyPlan(parsedContent);
+        setStudyPlanData(transformedData);
         
-        // Transform the content into the study plan format
-        if (parsedContent && parsedContent.topic && parsedContent.topic.length > 0) {
-          const transformedData = transformContentToStudyPlan(parsedContent);
-          setStudyPlanData(transformedData);
-          
-          // Set the first topic of the first day as active by default
-          if (transformedData.days.length > 0 && transformedData.days[0].topics.length > 0) {
-            setActiveTopic(transformedData.days[0].topics[0].id);
+        // Set the first topic of the first day as active by default
+        if (transformedData.days.length > 0 && transformedData.days[0].topics.length > 0) {
+          setActiveTopic(transformedData.days[0].topics[0].id);
+        }
+      }
+    }
+
+    const loadContent = async () => {
+      try {
+        const planIdFromUrl = new URLSearchParams(window.location.search).get('plan')
+        const storedContent = localStorage.getItem('studyPlanContent')
+        const planId = planIdFromUrl || (storedContent ? null : localStorage.getItem('studyPlanId'))
+        if (planId) {
+          // The browser revalidates with If-None-Match, so repeat views cost a 304
+          const response = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/study-plans/${planId}`)
+          if (response.ok) {
+            const parsedContent = await response.json() as StudyContent
+            console.log('Loaded study content from server:', planId)
+            localStorage.setItem('studyPlanId', planId)
+            localStorage.setItem('studyPlanContent', JSON.stringify({ topic: parsedContent.topic }))
+            applyContent(parsedContent)
+            return
           }
+          console.error(`Failed to load study plan ${planId} from server: ${response.statusText}`)
+        }
+        if (storedContent) {
+          const parsedContent = JSON.parse(storedContent) as StudyContent
+          console.log('Loaded study content from localStorage:', parsedContent)
+          applyContent(parsedContent)
         }
+      } catch (error) {
+        console.error('Error loading study content:', error)
+        // Fall back to sample data if there's an error
+      } finally {
+        setIsLoading(false)
       }
-      setIsLoading(false)
-    } catch (error) {
-      console.error('Error loading study content from localStorage:', error)
-      setIsLoading(false)
-      // Fall back to sample data if there's an error
     }
+
+    loadContent()
   }, [])
 
   // Load completed subtopics from localStorage
@@ -96,6 +96,7 @@ export default function UploadPage() {
     });
 
     let uploadSuccessful = false;
+    let materialSetId: string | null = null;
     try {
       console.log('Uploading files for user:', user.uid);
       const uploadResponse = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/upload-files`, {
@@ -112,6 +113,8 @@ export default function UploadPage() {
       
       console.log('Files uploaded successfully:', uploadResult);
       uploadSuccessful = true;
+      // Identifies the uploaded material, lets the backend reuse topics generated for the same files
+      materialSetId = uploadResult.material_set_id || null;
 
       // --- BEGIN Extract and Store Vector Store File IDs ---
       if (uploadResult && uploadResult.upload_details && Array.isArray(uploadResult.upload_details)) {
@@ -144,7 +147,8 @@ export default function UploadPage() {
       // Create request body for generate-topics (Using a placeholder subject for now)
       const subject = "User Uploaded Topic"; 
       const generateTopicsRequestBody = {
-        subject: subject
+        subject: subject,
+        material_set_id: materialSetId
       };
       
       // Store the subject and days until exam in localStorage for later use
@@ -175,7 +179,11 @@ export default function UploadPage() {
           console.log(`Making POST request to: ${process.env.NEXT_PUBLIC_API_BASE_URL}/generate-quiz`);
           console.log('Request body:', JSON.stringify(topicsData, null, 2));
           
-          const quizResponse = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/generate-quiz`, {
+          // The material set scopes the question bank to the uploaded files
+          const quizUrl = materialSetId
+            ? `${process.env.NEXT_PUBLIC_API_BASE_URL}/generate-quiz?material_set_id=${encodeURIComponent(materialSetId)}`
+            : `${process.env.NEXT_PUBLIC_API_BASE_URL}/generate-quiz`;
+          const quizResponse = await fetch(quizUrl, {
             method: 'POST',
             headers: {
               'Content-Type': 'application/json',